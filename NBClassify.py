@@ -4,101 +4,39 @@ import pandas as pd
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.metrics import accuracy_score, log_loss, confusion_matrix, classification_report
 import joblib
-import jieba
-from matplotlib import pyplot as plt
-import seaborn as sns
-
-# 定义自定义的CountVectorizer类
-class CountVectorizer:
-    def __init__(self, *, vocabulary=None, ngram_range=(1, 1), stop_words=None):
-        self.vocabulary = vocabulary
-        self.ngram_range = ngram_range
-        self.stop_words = stop_words
-
-    def fit_transform(self, texts):
-        self.vocabulary_ = {}
-        self.index_ = {}
-        index = 0
-        for text in texts:
-            ngrams = self._get_ngrams(text)
-            for ngram in ngrams:
-                if self.vocabulary is not None and ngram not in self.vocabulary:
-                    continue
-                if ngram not in self.vocabulary_:
-                    self.vocabulary_[ngram] = index
-                    self.index_[index] = ngram
-                    index += 1
-
-        matrix = np.zeros((len(texts), len(self.vocabulary_)), dtype=int)
-        for i, text in enumerate(texts):
-            ngrams = self._get_ngrams(text)
-            for ngram in ngrams:
-                if ngram in self.vocabulary_:
-                    j = self.vocabulary_[ngram]
-                    matrix[i][j] += 1
-        return matrix
-
-    def transform(self, texts):
-        matrix = np.zeros((len(texts), len(self.vocabulary_)), dtype=int)
-        for i, text in enumerate(texts):
-            ngrams = self._get_ngrams(text)
-            for ngram in ngrams:
-                if ngram in self.vocabulary_:
-                    j = self.vocabulary_[ngram]
-                    matrix[i][j] += 1
-        return matrix
-
-    def _get_ngrams(self, text):
-        try:
-            words = list(jieba.cut(text))
-        except:
-            words =['']
-        if self.stop_words is not None:
-            words = [word for word in words if word not in self.stop_words]
-
-        ngrams = []
-        min_n, max_n = self.ngram_range
-        for n in range(min_n, max_n + 1):
-            for i in range(len(words) - n + 1):
-                ngram = ' '.join(words[i:i + n])
-                ngrams.append(ngram)
-        return ngrams
-
-class TfidfVectorizer(CountVectorizer):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.idf_ = None
-
-    def fit_transform(self, texts):
-        tf_matrix = super().fit_transform(texts)
-        self.idf_ = np.log((1 + len(texts)) / (1 + np.sum(tf_matrix > 0, axis=0))) + 1
-        tfidf_matrix = tf_matrix * self.idf_
-        row_norms = np.linalg.norm(tfidf_matrix, axis=1, keepdims=True)
-        tfidf_matrix = tfidf_matrix / np.where(row_norms == 0, 1, row_norms)
-        return tfidf_matrix
-
-    def transform(self, texts):
-        tf_matrix = super().transform(texts)
-        tfidf_matrix = tf_matrix * self.idf_ if self.idf_ is not None else tf_matrix
-        row_norms = np.linalg.norm(tfidf_matrix, axis=1, keepdims=True)
-        tfidf_matrix = tfidf_matrix / np.where(row_norms == 0, 1, row_norms)
-        return tfidf_matrix
+
+# 使用 predict.py 中的向量器（稀疏矩阵输出），保存的模型可以直接被服务端加载
+from predict import TfidfVectorizer
+
+# 是否画出混淆矩阵；matplotlib / seaborn 只在需要画图时才导入
+PLOT_CONFUSION_MATRIX = True
 
 # 加载数据
 save_path = "./CNEC.csv"
 content_index = 'content'
 label_index = 'label'
 data = pd.read_csv(save_path)
-data = data.head(10000)
 
 # 把数据分为训练集和测试集，比例为8:2
 train_data = data.sample(frac=0.8, random_state=1)
 test_data = data.drop(train_data.index)
 
+# 词表裁剪：文档频率低于 MIN_DF / 高于 MAX_DF 的词不进入词表，MAX_FEATURES 限制词表大小（None 表示不限制）
+# 裁剪前后的模型大小和准确率对比见 python train_parallel.py --compare --min-df 2
+MIN_DF = 1
+MAX_DF = 1.0
+MAX_FEATURES = None
+
+# 分词器：None 为 jieba 精确模式，make_tokenizer('char') 按字切分（单字和相邻两字），分词器随向量器一起保存
+TOKENIZER = None
+
 # 使用自定义的TfidfVectorizer将文本转换为词频矩阵
-vectorizer = TfidfVectorizer()
+vectorizer = TfidfVectorizer(min_df=MIN_DF, max_df=MAX_DF, max_features=MAX_FEATURES, tokenizer=TOKENIZER)
 X_train = vectorizer.fit_transform(train_data[content_index])
 X_test = vectorizer.transform(test_data[content_index])
+stats = vectorizer.fit_stats_
+print(f"分词与词频统计: {stats['n_docs']} 篇文档, {stats['n_tokens']} 个词, "
+      f"耗时 {stats['seconds']:.2f}s, {stats['tokens_per_sec']:.0f} tokens/s")
 
 # 使用MultinomialNB进行朴素贝叶斯分类
 clf = MultinomialNB()
@@ -130,9 +68,13 @@ cm = confusion_matrix(test_data[label_index], y_pred)
 print('Confusion Matrix:')
 print(cm)
 
-plt.figure(figsize=(10, 7))
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=labels, yticklabels=labels)
-plt.xlabel('Predicted')
-plt.ylabel('Actual')
-plt.title('Confusion Matrix')
-plt.show()
+if PLOT_CONFUSION_MATRIX:
+    from matplotlib import pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(10, 7))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=labels, yticklabels=labels)
+    plt.xlabel('Predicted')
+    plt.ylabel('Actual')
+    plt.title('Confusion Matrix')
+    plt.show()
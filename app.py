@@ -1,100 +1,163 @@
-from flask import Flask, request, jsonify, send_from_directory, session
-import joblib
+import startup  # 最先导入，记录启动耗时的起点
+from flask import Flask, request, jsonify, send_from_directory, session, g, Response, abort
 import os
-from predict import predict_label
-import numpy as np
-import jieba
-import mysql.connector
-from config import MYSQL_CONFIG
+from predict import predict_label, predict_batch
+from verdict_cache import verdict_cache
+from campaign_index import campaign_index
+from config import (MYSQL_CONFIG, MODEL_CONFIG, DB_POOL_CONFIG, PAGE_CONFIG, CLASSIFY_QUEUE_CONFIG, RESCAN_CONFIG,
+                    PROFILING_CONFIG, FEEDBACK_CONFIG, STARTUP_CONFIG)
+from db_pool import ConnectionPool, mysql_factory
+from email_store import INSERT_EMAIL_SQL, email_row, USER_MARKED_VERSION
+from classify_queue import ClassificationQueue
+from model_registry import registry
+from rescan import RescanJob
+import metrics
+import time
+import hmac
+import random
+from profiling import RequestProfiler
+from feedback import FeedbackLearner
+import atexit
 import hashlib
+import base64
+from contextlib import contextmanager
 from functools import wraps
 from flask_cors import CORS
 from datetime import timedelta
 
-# 定义自定义的CountVectorizer类
-class CountVectorizer:
-    def __init__(self, *, vocabulary=None, ngram_range=(1, 1), stop_words=None):
-        self.vocabulary = vocabulary
-        self.ngram_range = ngram_range
-        self.stop_words = stop_words
-
-    def fit_transform(self, texts):
-        self.vocabulary_ = {}
-        self.index_ = {}
-        index = 0
-        for text in texts:
-            ngrams = self._get_ngrams(text)
-            for ngram in ngrams:
-                if self.vocabulary is not None and ngram not in self.vocabulary:
-                    continue
-                if ngram not in self.vocabulary_:
-                    self.vocabulary_[ngram] = index
-                    self.index_[index] = ngram
-                    index += 1
-
-        matrix = np.zeros((len(texts), len(self.vocabulary_)), dtype=int)
-        for i, text in enumerate(texts):
-            ngrams = self._get_ngrams(text)
-            for ngram in ngrams:
-                if ngram in self.vocabulary_:
-                    j = self.vocabulary_[ngram]
-                    matrix[i][j] += 1
-        return matrix
-
-    def transform(self, texts):
-        matrix = np.zeros((len(texts), len(self.vocabulary_)), dtype=int)
-        for i, text in enumerate(texts):
-            ngrams = self._get_ngrams(text)
-            for ngram in ngrams:
-                if ngram in self.vocabulary_:
-                    j = self.vocabulary_[ngram]
-                    matrix[i][j] += 1
-        return matrix
-
-    def _get_ngrams(self, text):
-        try:
-            words = list(jieba.cut(text))
-        except:
-            words =['']
-        if self.stop_words is not None:
-            words = [word for word in words if word not in self.stop_words]
-
-        ngrams = []
-        min_n, max_n = self.ngram_range
-        for n in range(min_n, max_n + 1):
-            for i in range(len(words) - n + 1):
-                ngram = ' '.join(words[i:i + n])
-                ngrams.append(ngram)
-        return ngrams
-
-class TfidfVectorizer(CountVectorizer):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.idf_ = None
-
-    def fit_transform(self, texts):
-        tf_matrix = super().fit_transform(texts)
-        self.idf_ = np.log((1 + len(texts)) / (1 + np.sum(tf_matrix > 0, axis=0))) + 1
-        tfidf_matrix = tf_matrix * self.idf_
-        row_norms = np.linalg.norm(tfidf_matrix, axis=1, keepdims=True)
-        tfidf_matrix = tfidf_matrix / np.where(row_norms == 0, 1, row_norms)
-        return tfidf_matrix
-
-    def transform(self, texts):
-        tf_matrix = super().transform(texts)
-        tfidf_matrix = tf_matrix * self.idf_ if self.idf_ is not None else tf_matrix
-        row_norms = np.linalg.norm(tfidf_matrix, axis=1, keepdims=True)
-        tfidf_matrix = tfidf_matrix / np.where(row_norms == 0, 1, row_norms)
-        return tfidf_matrix
+# 向量器类统一定义在 predict.py 中，这里导入是为了让以 __main__ 路径保存的旧向量器也能被反序列化
+from predict import CountVectorizer, TfidfVectorizer
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True)  # 允许跨域请求携带凭证
 app.secret_key = os.urandom(24)  # 用于session加密
 app.permanent_session_lifetime = timedelta(days=7)  # 设置session有效期为7天
 
+# 数据库连接池，每个请求借出一个连接，conn.close() 时归还（处理函数通过 db_cursor() 借出，出错时也会归还）
+db_pool = ConnectionPool(mysql_factory(MYSQL_CONFIG), **DB_POOL_CONFIG)
+
 # 数据库连接函数
 def get_db():
-    return mysql.connector.connect(**MYSQL_CONFIG)
+    return db_pool.connect()
+
+@contextmanager
+def db_cursor(**kwargs):
+    """借出连接和游标，处理结束或中途抛出异常时都关闭游标并把连接归还连接池"""
+    conn = get_db()
+    try:
+        cursor = conn.cursor(**kwargs)
+        try:
+            yield conn, cursor
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+# 异步分类队列，未开启时发送邮件在请求中同步分类
+classify_queue = None
+if CLASSIFY_QUEUE_CONFIG['enabled']:
+    classify_queue = ClassificationQueue(
+        get_db,
+        workers=CLASSIFY_QUEUE_CONFIG['workers'],
+        batch_size=CLASSIFY_QUEUE_CONFIG['batch_size'],
+        max_wait=CLASSIFY_QUEUE_CONFIG['max_wait'],
+        max_pending=CLASSIFY_QUEUE_CONFIG['max_pending'],
+        sweep_interval=CLASSIFY_QUEUE_CONFIG['sweep_interval']
+    )
+
+# 模型更新后的重新分类任务，开启 auto_start 时加载到新模型后在后台执行
+rescan_job = RescanJob(get_db, chunk_size=RESCAN_CONFIG['chunk_size'], max_rate=RESCAN_CONFIG['max_rate'])
+if RESCAN_CONFIG['auto_start']:
+    registry.add_listener(rescan_job.on_model_reload)
+
+# 用户反馈的增量学习，更新后的模型定期写入模型文件，各进程自动加载
+feedback_learner = None
+if FEEDBACK_CONFIG['enabled']:
+    feedback_learner = FeedbackLearner(
+        snapshot_interval=FEEDBACK_CONFIG['snapshot_interval'],
+        snapshot_every=FEEDBACK_CONFIG['snapshot_every'],
+        max_vocabulary=FEEDBACK_CONFIG['max_vocabulary'],
+        lock_path=FEEDBACK_CONFIG['lock_path'],
+        spool_path=FEEDBACK_CONFIG['spool_path']
+    )
+    atexit.register(feedback_learner.flush)
+
+# 连接池、判定缓存和分类队列的当前状态在输出指标时读取
+def _collect_metrics():
+    pool = db_pool.stats()
+    cache = verdict_cache.stats()
+    families = [
+        ('bayesmail_db_pool_connections', 'gauge', '连接池中的连接数',
+         [({'state': 'in_use'}, pool['in_use']), ({'state': 'idle'}, pool['idle'])]),
+        ('bayesmail_db_pool_timeouts_total', 'counter', '等待连接超时的次数', [({}, pool['timeouts'])]),
+        ('bayesmail_verdict_cache_lookups_total', 'counter', '判定缓存的查询次数',
+         [({'result': 'hit'}, cache['hits']), ({'result': 'shared_hit'}, cache['shared_hits']),
+          ({'result': 'miss'}, cache['misses'])])
+    ]
+    if classify_queue is not None:
+        families.append(('bayesmail_classify_queue_depth', 'gauge', '异步分类队列中等待的邮件数',
+                         [({}, classify_queue.pending())]))
+    return families
+
+metrics.add_collector(_collect_metrics)
+
+# 按请求的性能剖析：带管理员请求头或按 sample_rate 随机选中的请求，剖析结果写入环形缓冲目录
+profiler = RequestProfiler(
+    PROFILING_CONFIG['dir'],
+    max_profiles=PROFILING_CONFIG['max_profiles'],
+    format=PROFILING_CONFIG['format'],
+    interval=PROFILING_CONFIG['interval']
+)
+
+def _is_profile_admin():
+    token = PROFILING_CONFIG['token']
+    provided = request.headers.get(PROFILING_CONFIG['header'])
+    return bool(token and provided and hmac.compare_digest(provided, token))
+
+def _should_profile():
+    if request.path.startswith('/api/profiles'):
+        return False
+    sample_rate = PROFILING_CONFIG['sample_rate']
+    return _is_profile_admin() or (sample_rate > 0 and random.random() < sample_rate)
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+    if _should_profile():
+        g.profile = profiler.start()
+
+def _endpoint_label():
+    # 用路由规则而不是实际路径作为标签，避免 /api/email/<id> 产生大量不同的标签
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def _finish_profile():
+    """结束本请求的剖析并保存结果，返回文件名；本请求没有剖析或已经结束时返回 None"""
+    profile = g.pop('profile', None)
+    if profile is None:
+        return None
+    try:
+        return profiler.finish(profile, f'{request.method} {_endpoint_label()}')
+    except Exception as e:
+        print(f"保存剖析结果失败: {e}")
+        return None
+
+@app.after_request
+def _record_request_time(response):
+    endpoint = _endpoint_label()
+    profile_name = _finish_profile()
+    if profile_name is not None:
+        response.headers['X-Profile-Id'] = profile_name
+    start = g.get('request_start')
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        metrics.HTTP_REQUEST_SECONDS.observe(elapsed, endpoint, request.method)
+        startup.record_first_request(elapsed)
+    return response
+
+@app.teardown_request
+def _stop_profile(exc):
+    # 处理函数抛出异常时 after_request 不一定执行，这里保证 cProfile 被关闭、采样线程不再采样已结束的请求
+    _finish_profile()
 
 # 登录验证装饰器
 def login_required(f):
@@ -132,10 +195,7 @@ def register():
     if len(password) < 6:
         return jsonify({'error': '密码长度至少为6位'}), 400
 
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
+    with db_cursor(dictionary=True) as (conn, cursor):
         # 检查邮箱是否已存在
         cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
         if cursor.fetchone():
@@ -165,10 +225,6 @@ def register():
                 'email': email
             }
         })
-            
-    finally:
-        cursor.close()
-        conn.close()
 
 # 登录API
 @app.route('/api/login', methods=['POST'])
@@ -180,10 +236,7 @@ def login():
     if not email or not password:
         return jsonify({'error': '请输入邮箱和密码'}), 400
 
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
+    with db_cursor(dictionary=True) as (conn, cursor):
         # 密码加密
         hashed_password = hashlib.md5(password.encode()).hexdigest()
         
@@ -205,10 +258,6 @@ def login():
             })
         else:
             return jsonify({'error': '邮箱或密码错误'}), 401
-            
-    finally:
-        cursor.close()
-        conn.close()
 
 # 获取用户信息API
 @app.route('/api/user', methods=['GET'])
@@ -233,6 +282,71 @@ def classify_email():
         'message': result
     })
 
+# 批量邮件分类API
+@app.route('/api/classify_batch', methods=['POST'])
+@login_required
+def classify_email_batch():
+    data = request.json
+    contents = data.get('contents')
+
+    if not isinstance(contents, list) or not all(isinstance(c, str) for c in contents):
+        return jsonify({'error': 'contents 必须是邮件内容的列表'}), 400
+
+    if len(contents) > MODEL_CONFIG['max_batch_size']:
+        return jsonify({'error': f"单次最多分类 {MODEL_CONFIG['max_batch_size']} 封邮件"}), 400
+
+    try:
+        results = predict_batch(contents)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({'results': results})
+
+# 判定结果缓存命中情况API
+@app.route('/api/verdict_cache', methods=['GET'])
+@login_required
+def get_verdict_cache_stats():
+    return jsonify(verdict_cache.stats())
+
+# 数据库连接池状态API
+@app.route('/api/db_pool', methods=['GET'])
+@login_required
+def get_db_pool_stats():
+    return jsonify(db_pool.stats())
+
+# 异步分类队列状态API
+@app.route('/api/classify_queue', methods=['GET'])
+@login_required
+def get_classify_queue_stats():
+    if classify_queue is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **classify_queue.stats()})
+
+# 性能指标API（Prometheus 文本格式，供监控系统抓取，不需要登录）
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# 剖析结果列表API（需要管理员请求头）
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    if not _is_profile_admin():
+        abort(403)
+    return jsonify({'format': PROFILING_CONFIG['format'], 'profiles': profiler.list()})
+
+# 下载剖析结果API（需要管理员请求头）
+@app.route('/api/profiles/<path:name>', methods=['GET'])
+def download_profile(name):
+    if not _is_profile_admin():
+        abort(403)
+    return send_from_directory(os.path.abspath(PROFILING_CONFIG['dir']), name, as_attachment=True)
+
+# 重新分类任务进度API
+@app.route('/api/rescan', methods=['GET'])
+@login_required
+def get_rescan_stats():
+    return jsonify({'auto_start': RESCAN_CONFIG['auto_start'], **rescan_job.stats()})
+
 # 发送邮件API
 @app.route('/api/send_email', methods=['POST'])
 @login_required
@@ -245,105 +359,105 @@ def send_email():
     if not all([receiver_email, subject, content]):
         return jsonify({'error': '请填写完整的邮件信息'}), 400
 
-    conn = get_db()
-    cursor = conn.cursor()
-
-    try:
-        # 获取接收者ID
-        cursor.execute("SELECT id FROM users WHERE email = %s", (receiver_email,))
-        receiver = cursor.fetchone()
-        if not receiver:
-            return jsonify({'error': '收件人不存在'}), 404
-
-        # 使用朴素贝叶斯模型预测是否为垃圾邮件
-        is_spam = predict_label(content) == '垃圾邮件'
-
-        # 插入邮件
-        cursor.execute("""
-            INSERT INTO emails (sender_id, receiver_id, subject, content, is_spam)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (session['user_id'], receiver[0], subject, content, is_spam))
-
-        conn.commit()
-        return jsonify({'message': '邮件发送成功'})
-
-    except Exception as e:
-        conn.rollback()
-        return jsonify({'error': str(e)}), 500
-
-    finally:
-        cursor.close()
-        conn.close()
+    with db_cursor() as (conn, cursor):
+        try:
+            # 获取接收者ID
+            cursor.execute("SELECT id FROM users WHERE email = %s", (receiver_email,))
+            receiver = cursor.fetchone()
+            if not receiver:
+                return jsonify({'error': '收件人不存在'}), 404
+
+            if classify_queue is not None:
+                # 异步模式：先以待分类状态（is_spam 为 NULL）写入，分类完成前收件人的收件箱和垃圾箱中都不显示
+                is_spam = None
+            else:
+                # 使用朴素贝叶斯模型预测是否为垃圾邮件
+                is_spam = predict_label(content, check_campaigns=True) == '垃圾邮件'
+
+            # 插入邮件（同时写入列表用的摘要）
+            cursor.execute(INSERT_EMAIL_SQL, email_row(session['user_id'], receiver[0], subject, content, is_spam))
+
+            conn.commit()
+            if classify_queue is not None:
+                classify_queue.submit(cursor.lastrowid, content)
+            return jsonify({'message': '邮件发送成功'})
+
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 500
 
 # 获取收件箱API
 @app.route('/api/inbox', methods=['GET'])
 @login_required
 def get_inbox():
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-
-    try:
-        # 获取所有收到的邮件，包括垃圾邮件标记
-        cursor.execute("""
-            SELECT e.*, u.email as sender_email 
-            FROM emails e
-            JOIN users u ON e.sender_id = u.id
-            WHERE e.receiver_id = %s AND e.is_spam = FALSE
-            ORDER BY e.created_at DESC
-        """, (session['user_id'],))
-
-        emails = cursor.fetchall()
-        return jsonify({'emails': emails})
-
-    finally:
-        cursor.close()
-        conn.close()
+    # 获取收到的正常邮件，按 (created_at, id) 倒序分页
+    return _list_folder('sender', "e.receiver_id = %s AND e.is_spam = FALSE")
 
 # 获取垃圾邮件API
 @app.route('/api/spam', methods=['GET'])
 @login_required
 def get_spam_emails():
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-
-    try:
-        cursor.execute("""
-            SELECT e.*, u.email as sender_email 
-            FROM emails e
-            JOIN users u ON e.sender_id = u.id
-            WHERE e.receiver_id = %s AND e.is_spam = TRUE
-            ORDER BY e.created_at DESC
-        """, (session['user_id'],))
-
-        emails = cursor.fetchall()
-        return jsonify({'emails': emails})
-
-    finally:
-        cursor.close()
-        conn.close()
+    return _list_folder('sender', "e.receiver_id = %s AND e.is_spam = TRUE")
 
 # 获取已发送邮件API
 @app.route('/api/sent', methods=['GET'])
 @login_required
 def get_sent_emails():
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-
-    try:
-        cursor.execute("""
-            SELECT e.*, u.email as receiver_email 
-            FROM emails e
-            JOIN users u ON e.receiver_id = u.id
-            WHERE e.sender_id = %s
-            ORDER BY e.created_at DESC
-        """, (session['user_id'],))
-
+    return _list_folder('receiver', "e.sender_id = %s")
+
+def _encode_cursor(email):
+    raw = f"{email['created_at']}|{email['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    created_at, email_id = raw.rsplit('|', 1)
+    return created_at, int(email_id)
+
+# 列表摘要模式返回的字段：只有邮件头和写入时生成的摘要，不读取正文
+SUMMARY_COLUMNS = "e.id, e.sender_id, e.receiver_id, e.subject, e.snippet, e.is_spam, e.created_at"
+
+def _list_folder(contact, where):
+    """
+    邮件列表的游标分页：cursor 为上一页最后一封邮件的 (created_at, id)，
+    配合 (receiver_id, is_spam, created_at, id) 和 (sender_id, created_at, id) 索引，
+    每页的查询代价与邮箱大小无关。
+    view=summary 时只返回邮件头和摘要，正文由 /api/email/<id> 获取
+    """
+    page_size = request.args.get('limit', PAGE_CONFIG['default_size'], type=int)
+    page_size = max(1, min(page_size, PAGE_CONFIG['max_size']))
+
+    columns = SUMMARY_COLUMNS if request.args.get('view') == 'summary' else 'e.*'
+    sql = f"""
+        SELECT {columns}, u.email as {contact}_email 
+        FROM emails e
+        JOIN users u ON e.{contact}_id = u.id
+        WHERE {where}
+    """
+    params = [session['user_id']]
+    cursor_arg = request.args.get('cursor')
+    if cursor_arg:
+        try:
+            created_at, email_id = _decode_cursor(cursor_arg)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'error': '无效的分页游标'}), 400
+        sql += " AND (e.created_at < %s OR (e.created_at = %s AND e.id < %s))"
+        params += [created_at, created_at, email_id]
+    sql += " ORDER BY e.created_at DESC, e.id DESC LIMIT %s"
+    params.append(page_size + 1)
+
+    with db_cursor(dictionary=True) as (conn, cursor):
+        cursor.execute(sql, tuple(params))
         emails = cursor.fetchall()
-        return jsonify({'emails': emails})
 
-    finally:
-        cursor.close()
-        conn.close()
+        # 多取一条用来判断是否还有下一页
+        has_more = len(emails) > page_size
+        emails = emails[:page_size]
+        return jsonify({
+            'emails': emails,
+            'has_more': has_more,
+            'next_cursor': _encode_cursor(emails[-1]) if has_more else None
+        })
 
 # 退出登录API
 @app.route('/api/logout', methods=['POST'])
@@ -356,16 +470,11 @@ def logout():
 @app.route('/api/users', methods=['GET'])
 def get_users():
     try:
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
-        
-        # 获取所有用户的邮箱
-        cursor.execute("SELECT email FROM users")
-        users = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        with db_cursor(dictionary=True) as (conn, cursor):
+            # 获取所有用户的邮箱
+            cursor.execute("SELECT email FROM users")
+            users = cursor.fetchall()
+
         return jsonify(users)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -374,10 +483,7 @@ def get_users():
 @app.route('/api/email/<int:email_id>', methods=['GET'])
 @login_required
 def get_email(email_id):
-    conn = get_db()
-    cursor = conn.cursor(dictionary=True)
-
-    try:
+    with db_cursor(dictionary=True) as (conn, cursor):
         # 获取邮件详情，同时获取发件人和收件人的邮箱
         cursor.execute("""
             SELECT e.*, 
@@ -397,9 +503,75 @@ def get_email(email_id):
 
         return jsonify(email)
 
-    finally:
-        cursor.close()
-        conn.close()
+# 标记邮件为垃圾邮件 / 不是垃圾邮件API，请求体 {"is_spam": true/false}
+@app.route('/api/email/<int:email_id>/feedback', methods=['POST'])
+@login_required
+def mark_email(email_id):
+    data = request.json or {}
+    if not isinstance(data.get('is_spam'), bool):
+        return jsonify({'error': '请指定 is_spam 为 true 或 false'}), 400
+    is_spam = data['is_spam']
+
+    with db_cursor(dictionary=True) as (conn, cursor):
+        # 只有收件人可以标记
+        cursor.execute(
+            "SELECT content, is_spam FROM emails WHERE id = %s AND receiver_id = %s",
+            (email_id, session['user_id'])
+        )
+        email = cursor.fetchone()
+        if not email:
+            return jsonify({'error': '邮件不存在或无权限操作'}), 404
+
+        # 提交之前读取模型版本：加载模型失败时标记还没有保存，客户端重试不会重复计入反馈
+        model_version = registry.get().version if not is_spam else None
+
+        cursor.execute(
+            "UPDATE emails SET is_spam = %s, model_version = %s WHERE id = %s",
+            (is_spam, USER_MARKED_VERSION, email_id)
+        )
+        conn.commit()
+
+    # 标记为正常邮件后，缓存的判定结果和相似垃圾邮件索引中的条目不能再让同样或相似的邮件被直接判为垃圾邮件；
+    # 标记已经保存，清理失败只记录错误，仍然返回成功
+    if not is_spam:
+        try:
+            verdict_cache.discard(email['content'], model_version)
+            if campaign_index is not None:
+                campaign_index.remove(email['content'])
+        except Exception as e:
+            print(f"清理判定缓存失败: {e}")
+
+    # 只有与当前判定不同的反馈才用于更新模型，重复标记不会重复计数
+    learned = False
+    if feedback_learner is not None and email['is_spam'] is not None and bool(email['is_spam']) != is_spam:
+        try:
+            feedback_learner.learn(email['content'], is_spam)
+            learned = True
+        except Exception as e:
+            metrics.CLASSIFICATION_ERRORS.inc('feedback')
+            print(f"反馈学习失败: {e}")
+    return jsonify({'message': '标记成功', 'learned': learned})
+
+# 反馈学习状态API
+@app.route('/api/feedback', methods=['GET'])
+@login_required
+def get_feedback_stats():
+    if feedback_learner is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **feedback_learner.stats()})
+
+startup.mark_imported()
 
 if __name__ == '__main__':
+    if STARTUP_CONFIG['warm_up']:
+        # 加载词典和模型并预热，第一个请求不再承担数秒的初始化开销
+        phases = startup.prepare()
+        print('启动准备完成: ' + ', '.join(f'{phase} {seconds:.2f}s' for phase, seconds in phases.items()))
+    if classify_queue is not None:
+        # 启动后台分类线程，并接着处理上次退出时还未分类的邮件
+        classify_queue.start()
+    if feedback_learner is not None:
+        # 定期保存反馈，上次退出时暂存的反馈也一并写入模型
+        feedback_learner.start()
+    # 单进程的开发服务器；生产环境使用 python serve.py（多进程，共享模型内存）
     app.run(debug=True, port=5000) 
\ No newline at end of file
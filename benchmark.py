@@ -0,0 +1,539 @@
+# encoding=utf8
+"""
+性能基准测试
+
+以 CNEC.csv 中固定随机种子抽取的样本为测试数据，测量：
+  segmentation  结巴分词和 CountVectorizer._get_ngrams 的吞吐量
+  vectorizer    TfidfVectorizer 的 fit_transform / transform 耗时和内存峰值
+  prediction    predict_label 单封延迟（未命中 / 命中判定缓存）和 predict_batch 不同批大小的延迟
+  http          /api/send_email 和 /api/inbox 的端到端延迟（SQLite 替身数据库，Flask 测试客户端）
+  startup       新进程导入 app.py 的耗时，以及没有词典缓存 / 有缓存 / 启动时预热三种情况下第一封邮件的分类耗时
+  tokenizers    各分词器（jieba、按字 n-gram，指定 --dictionary / --userdict 时加上自定义词典的 jieba）
+                的分词吞吐量，以及在同一训练 / 测试划分上训练朴素贝叶斯模型的耗时、词表大小和准确率
+  serve         用 serve.py 分别启动 1、2、4 … 个工作进程（到 CPU 核数为止），多个客户端进程并发请求 /api/classify，
+                测量每秒请求数和延迟；scaling_efficiency 为最多工作进程时的吞吐量与单进程吞吐量 × 进程数之比
+                （客户端与服务在同一台机器上，也会占用 CPU）
+
+结果以 JSON 输出，可以保存为基线，之后的运行用 --baseline 对比，变差超过阈值时返回非零退出码。
+
+用法:
+    python benchmark.py --output baseline.json
+    python benchmark.py --baseline baseline.json --threshold 0.1
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import jieba
+import numpy as np
+import pandas as pd
+
+import predict
+from campaign_index import CampaignIndex
+from config import CAMPAIGN_INDEX_CONFIG
+from db_pool import ConnectionPool, sqlite_factory
+from email_store import INSERT_EMAIL_SQL, email_row
+from predict import CountVectorizer, TfidfVectorizer, get_model, predict_batch, predict_label
+from tokenizer import ensure_jieba, make_tokenizer
+from verdict_cache import verdict_cache
+
+BENCHMARK_NAMES = ['segmentation', 'vectorizer', 'prediction', 'http', 'startup', 'tokenizers', 'serve']
+
+BATCH_SIZES = [1, 8, 64, 512]
+
+# SQLite 替身数据库的表结构，与 init_db.py 中的 MySQL 表结构对应
+SQLITE_SCHEMA = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email VARCHAR(255) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        is_admin BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE emails (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sender_id INT NOT NULL,
+        receiver_id INT NOT NULL,
+        subject VARCHAR(255) NOT NULL,
+        content TEXT NOT NULL,
+        snippet VARCHAR(100) NOT NULL DEFAULT '',
+        is_spam BOOLEAN DEFAULT FALSE,
+        model_version VARCHAR(12) NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_receiver_folder ON emails (receiver_id, is_spam, created_at, id);
+    CREATE INDEX idx_sender_sent ON emails (sender_id, created_at, id);
+"""
+
+
+def load_fixture(csv_path, n_docs, seed):
+    """从语料中按固定种子抽取 n_docs 篇文档，返回 (正文列表, 是否垃圾邮件列表)"""
+    data = pd.read_csv(csv_path).dropna(subset=['content'])
+    data = data.sample(n=min(n_docs, len(data)), random_state=seed)
+    return data['content'].astype(str).tolist(), (data['label'] == 'spam').tolist()
+
+
+def _timings(func, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def _latency_ms(seconds):
+    """延迟分布（毫秒）"""
+    values = np.array(seconds) * 1000
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean())
+    }
+
+
+def _peak_bytes(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_segmentation(docs, labels, repeat):
+    ensure_jieba()
+    n_chars = sum(len(doc) for doc in docs)
+    analyzer = CountVectorizer()
+
+    lcut_seconds = min(_timings(lambda: [jieba.lcut(doc) for doc in docs], repeat))
+    ngram_seconds = min(_timings(lambda: [analyzer._get_ngrams(doc) for doc in docs], repeat))
+    n_tokens = sum(len(jieba.lcut(doc)) for doc in docs)
+    return {
+        'docs': len(docs),
+        'jieba_lcut_seconds': lcut_seconds,
+        'jieba_docs_per_sec': len(docs) / lcut_seconds,
+        'jieba_chars_per_sec': n_chars / lcut_seconds,
+        'jieba_tokens_per_sec': n_tokens / lcut_seconds,
+        'get_ngrams_seconds': ngram_seconds,
+        'get_ngrams_docs_per_sec': len(docs) / ngram_seconds
+    }
+
+
+def bench_vectorizer(docs, labels, repeat):
+    split = int(len(docs) * 0.8)
+    train_docs, test_docs = docs[:split], docs[split:]
+    vectorizer = TfidfVectorizer()
+
+    fit_seconds = _timings(lambda: vectorizer.fit_transform(train_docs), repeat)
+    transform_seconds = _timings(lambda: vectorizer.transform(test_docs), repeat)
+    X = vectorizer.transform(test_docs)
+
+    # tracemalloc 会拖慢执行，内存峰值单独测一次
+    return {
+        'train_docs': len(train_docs),
+        'test_docs': len(test_docs),
+        'vocabulary_size': len(vectorizer.vocabulary_),
+        'transform_nnz': int(X.nnz) if hasattr(X, 'nnz') else int(np.count_nonzero(X)),
+        'fit_transform_seconds': min(fit_seconds),
+        'fit_transform_docs_per_sec': len(train_docs) / min(fit_seconds),
+        'fit_transform_peak_bytes': _peak_bytes(lambda: TfidfVectorizer().fit_transform(train_docs)),
+        'transform_seconds': min(transform_seconds),
+        'transform_docs_per_sec': len(test_docs) / min(transform_seconds),
+        'transform_peak_bytes': _peak_bytes(lambda: vectorizer.transform(test_docs))
+    }
+
+
+def _isolate_campaign_index():
+    """换成不落盘的空索引，避免基准测试写入线上的相似索引文件，也让每次运行的初始状态相同"""
+    if predict.campaign_index is not None:
+        config = {key: value for key, value in CAMPAIGN_INDEX_CONFIG.items() if key not in ('enabled', 'path')}
+        predict.campaign_index = CampaignIndex(**config)
+
+
+def bench_prediction(docs, labels, repeat):
+    snapshot = get_model()
+    _isolate_campaign_index()
+
+    def per_message(check_campaigns):
+        seconds = []
+        for doc in docs:
+            start = time.perf_counter()
+            predict_label(doc, check_campaigns=check_campaigns)
+            seconds.append(time.perf_counter() - start)
+        return seconds
+
+    verdict_cache.clear()
+    results = {'model_version': snapshot.version, 'docs': len(docs)}
+    for name, value in _latency_ms(per_message(False)).items():
+        results[f'predict_label_{name}'] = value
+    for name, value in _latency_ms(per_message(False)).items():
+        results[f'predict_label_cached_{name}'] = value
+    verdict_cache.clear()
+    for name, value in _latency_ms(per_message(True)).items():
+        results[f'predict_label_campaigns_{name}'] = value
+    verdict_cache.clear()
+
+    for batch_size in BATCH_SIZES:
+        batches = [docs[i:i + batch_size] for i in range(0, len(docs), batch_size)]
+        seconds = min(_timings(lambda: [predict_batch(batch, snapshot) for batch in batches], repeat))
+        results[f'predict_batch_{batch_size}_docs_per_sec'] = len(docs) / seconds
+        results[f'predict_batch_{batch_size}_batch_ms'] = seconds / len(batches) * 1000
+    return results
+
+
+def bench_http(docs, labels, repeat, n_requests=200, page_size=50):
+    import app as app_module
+
+    _isolate_campaign_index()
+    verdict_cache.clear()
+    db_dir = tempfile.mkdtemp(prefix='bayesmail-bench-')
+    db_path = os.path.join(db_dir, 'bench.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SQLITE_SCHEMA)
+    conn.commit()
+    conn.close()
+
+    # 应用通过模块级的 db_pool 获取连接，换成 SQLite 替身；基准测试使用同步分类
+    original_pool, original_queue = app_module.db_pool, app_module.classify_queue
+    app_module.db_pool = ConnectionPool(sqlite_factory(db_path))
+    app_module.classify_queue = None
+    try:
+        sender, receiver = app_module.app.test_client(), app_module.app.test_client()
+        sender.post('/api/register', json={'email': 'sender@bench.local', 'password': 'bench123'})
+        receiver.post('/api/register', json={'email': 'receiver@bench.local', 'password': 'bench123'})
+
+        # 预先写入一批带标签的邮件，收件箱列表有足够多的数据可以分页（新库中发件人 id 为 1，收件人为 2）
+        conn = app_module.db_pool.connect()
+        cursor = conn.cursor()
+        cursor.executemany(INSERT_EMAIL_SQL, [
+            email_row(1, 2, f'基准测试邮件 {i}', doc, is_spam)
+            for i, (doc, is_spam) in enumerate(zip(docs, labels))
+        ])
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        send_seconds = []
+        for i in range(n_requests):
+            payload = {'to': 'receiver@bench.local', 'subject': f'基准测试 {i}', 'content': docs[i % len(docs)]}
+            start = time.perf_counter()
+            response = sender.post('/api/send_email', json=payload)
+            send_seconds.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/send_email 返回 {response.status_code}: {response.get_json()}")
+
+        def inbox(view):
+            seconds = []
+            for _ in range(n_requests):
+                start = time.perf_counter()
+                response = receiver.get(f'/api/inbox?limit={page_size}&view={view}')
+                seconds.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/api/inbox 返回 {response.status_code}")
+            return seconds
+
+        results = {'requests': n_requests, 'page_size': page_size, 'mailbox_size': len(docs) + n_requests}
+        for name, value in _latency_ms(send_seconds).items():
+            results[f'send_email_{name}'] = value
+        for view in ('full', 'summary'):
+            for name, value in _latency_ms(inbox(view)).items():
+                results[f'inbox_{view}_{name}'] = value
+        return results
+    finally:
+        app_module.db_pool.dispose()
+        app_module.db_pool, app_module.classify_queue = original_pool, original_queue
+        verdict_cache.clear()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+# 在新进程中执行：导入 app.py，可选地执行启动准备，再分类第一封邮件；结果以 JSON 输出到标准输出
+_STARTUP_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+from config import STARTUP_CONFIG
+STARTUP_CONFIG['jieba_cache_dir'] = sys.argv[1]
+import app, startup
+from predict import get_model
+result = {'import_seconds': time.perf_counter() - start}
+if sys.argv[2] == 'prepare':
+    result['prepare_seconds'] = sum(startup.prepare().values())
+start = time.perf_counter()
+snapshot = get_model()
+snapshot.model.predict(snapshot.vectorizer.transform([sys.argv[3]]))
+result['first_classify_seconds'] = time.perf_counter() - start
+print(json.dumps(result))
+'''
+
+
+def _probe_startup(cache_dir, mode, text):
+    output = subprocess.run([sys.executable, '-c', _STARTUP_PROBE, cache_dir, mode, text], capture_output=True,
+                            text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_startup(docs, labels, repeat):
+    """每次测量都启动新的 Python 进程；词典缓存放在临时目录，不影响 cache/ 中已有的缓存"""
+    text = docs[0]
+    cold, cached, prepared = [], [], []
+    for _ in range(repeat):
+        cache_dir = tempfile.mkdtemp(prefix='bayesmail-jieba-')
+        try:
+            cold.append(_probe_startup(cache_dir, 'cold', text))
+            cached.append(_probe_startup(cache_dir, 'cold', text))
+            prepared.append(_probe_startup(cache_dir, 'prepare', text))
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    return {
+        'import_app_seconds': min(result['import_seconds'] for result in cold + cached + prepared),
+        'first_classify_no_cache_seconds': min(result['first_classify_seconds'] for result in cold),
+        'first_classify_cached_seconds': min(result['first_classify_seconds'] for result in cached),
+        'prepare_seconds': min(result['prepare_seconds'] for result in prepared),
+        'first_classify_prepared_seconds': min(result['first_classify_seconds'] for result in prepared)
+    }
+
+
+def bench_tokenizers(docs, labels, repeat, dictionary=None, userdict=None):
+    from sklearn.naive_bayes import MultinomialNB
+
+    backends = {'jieba': make_tokenizer('jieba'), 'char': make_tokenizer('char')}
+    if dictionary or userdict:
+        backends['jieba_dict'] = make_tokenizer('jieba', dictionary=dictionary, userdict=userdict)
+
+    split = int(len(docs) * 0.8)
+    train_docs, test_docs = docs[:split], docs[split:]
+    y_train, y_test = np.array(labels[:split], dtype=int), np.array(labels[split:], dtype=int)
+
+    result = {'train_docs': len(train_docs), 'test_docs': len(test_docs)}
+    for name, tokenizer in backends.items():
+        cut = tokenizer.prepare()
+        tokenize_seconds = min(_timings(lambda: [cut(doc) for doc in docs], repeat))
+
+        vectorizer = TfidfVectorizer(tokenizer=tokenizer)
+        start = time.perf_counter()
+        X_train = vectorizer.fit_transform(train_docs)
+        model = MultinomialNB().fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        accuracy = float((model.predict(vectorizer.transform(test_docs)) == y_test).mean())
+
+        result.update({
+            f'{name}_tokenize_docs_per_sec': len(docs) / tokenize_seconds,
+            f'{name}_fit_seconds': fit_seconds,
+            f'{name}_vocabulary_size': len(vectorizer.vocabulary_),
+            f'{name}_accuracy': accuracy
+        })
+    return result
+
+
+def _http_request(port, method, path, payload=None, cookie=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    if cookie:
+        headers['Cookie'] = cookie
+    try:
+        conn.request(method, path, json.dumps(payload) if payload is not None else None, headers)
+        response = conn.getresponse()
+        response.read()
+        return response
+    finally:
+        conn.close()
+
+
+def _serve_client(port, cookie, docs, seconds):
+    """客户端进程：在 seconds 秒内逐个发送分类请求，返回每个请求的耗时；每次的内容都不同，不会命中判定缓存"""
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        payload = {'content': f'{docs[i % len(docs)]} {os.getpid()}-{i}'}
+        start = time.perf_counter()
+        response = _http_request(port, 'POST', '/api/classify', payload, cookie)
+        if response.status != 200:
+            raise RuntimeError(f"/api/classify 返回 {response.status}")
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    return latencies
+
+
+def _wait_until_serving(process, port, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py 启动失败，退出码 {process.returncode}")
+        try:
+            _http_request(port, 'GET', '/api/metrics')
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"serve.py 在 {timeout} 秒内没有开始服务")
+
+
+def bench_serve(docs, labels, repeat, worker_counts=None, seconds=5.0):
+    if worker_counts is None:
+        cpu_count = os.cpu_count() or 1
+        worker_counts = sorted({2 ** i for i in range(cpu_count.bit_length()) if 2 ** i <= cpu_count} | {cpu_count})
+    db_dir = tempfile.mkdtemp(prefix='bayesmail-serve-')
+    db_path = os.path.join(db_dir, 'bench.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SQLITE_SCHEMA)
+    conn.commit()
+    conn.close()
+    account = {'email': 'serve@bench.local', 'password': 'bench123'}
+
+    results = {'seconds': seconds}
+    try:
+        for workers in worker_counts:
+            with socket.socket() as probe:
+                probe.bind(('127.0.0.1', 0))
+                port = probe.getsockname()[1]
+            process = subprocess.Popen(
+                [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+                 '--sqlite', db_path],
+                cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                _wait_until_serving(process, port)
+                _http_request(port, 'POST', '/api/register', account)
+                cookie = _http_request(port, 'POST', '/api/login', account).getheader('Set-Cookie').split(';')[0]
+
+                # 每个工作进程对应两个客户端，保证工作进程一直有请求可处理
+                clients = workers * 2
+                with ProcessPoolExecutor(max_workers=clients) as executor:
+                    futures = [executor.submit(_serve_client, port, cookie, docs, seconds) for _ in range(clients)]
+                    latencies = [latency for future in futures for latency in future.result()]
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait()
+
+            results[f'workers_{workers}_requests_per_sec'] = len(latencies) / seconds
+            for name, value in _latency_ms(latencies).items():
+                results[f'workers_{workers}_{name}'] = value
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    first, last = worker_counts[0], worker_counts[-1]
+    results['scaling_efficiency'] = (results[f'workers_{last}_requests_per_sec'] * first /
+                                     (results[f'workers_{first}_requests_per_sec'] * last))
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _direction(metric):
+    """指标越大越好返回 1，越小越好返回 -1，不参与对比的返回 0"""
+    if metric.endswith(('_per_sec', '_accuracy')):
+        return 1
+    if metric.endswith(('_ms', '_seconds', '_bytes')):
+        return -1
+    return 0
+
+
+def compare(current, baseline, threshold):
+    """逐项与基线对比，打印变化比例，返回变差超过阈值的指标列表"""
+    regressions = []
+    for bench, metrics in current['results'].items():
+        base_metrics = baseline.get('results', {}).get(bench)
+        if not base_metrics:
+            continue
+        for metric, value in metrics.items():
+            direction = _direction(metric)
+            base = base_metrics.get(metric)
+            if not direction or not isinstance(base, (int, float)) or not base:
+                continue
+            change = (value - base) / base
+            worse = -change * direction > threshold
+            mark = '  <-- 变差' if worse else ''
+            print(f"{bench}.{metric:<40} {base:>14.4f} -> {value:>14.4f}  {change:+7.1%}{mark}")
+            if worse:
+                regressions.append(f'{bench}.{metric}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分词、向量化、预测和 HTTP 接口的性能基准测试')
+    parser.add_argument('--csv', default='./CNEC.csv', help='测试数据来源，label,content 格式')
+    parser.add_argument('--docs', type=int, default=2000, help='抽取的文档数')
+    parser.add_argument('--seed', type=int, default=1, help='抽样的随机种子')
+    parser.add_argument('--repeat', type=int, default=3, help='吞吐量测试的重复次数（取最好的一次）')
+    parser.add_argument('--requests', type=int, default=200, help='每个 HTTP 接口的请求数')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARK_NAMES, default=BENCHMARK_NAMES, help='只运行指定的测试')
+    parser.add_argument('--dictionary', default=None, help='tokenizers 测试中自定义 jieba 主词典的路径')
+    parser.add_argument('--userdict', default=None, help='tokenizers 测试中追加的 jieba 自定义词典路径')
+    parser.add_argument('--serve-workers', type=int, nargs='+', default=None,
+                        help='serve 测试的工作进程数，默认为 1、2、4 … 直到 CPU 核数')
+    parser.add_argument('--serve-seconds', type=float, default=5.0, help='serve 测试中每种进程数的压测秒数')
+    parser.add_argument('--output', default=None, help='结果写入的 JSON 文件，默认输出到标准输出')
+    parser.add_argument('--baseline', default=None, help='与之对比的基线 JSON 文件')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定为变差的相对变化阈值')
+    args = parser.parse_args()
+
+    docs, labels = load_fixture(args.csv, args.docs, args.seed)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'csv': args.csv,
+            'docs': len(docs),
+            'seed': args.seed,
+            'repeat': args.repeat
+        },
+        'results': {}
+    }
+
+    benchmarks = {
+        'segmentation': lambda: bench_segmentation(docs, labels, args.repeat),
+        'vectorizer': lambda: bench_vectorizer(docs, labels, args.repeat),
+        'prediction': lambda: bench_prediction(docs, labels, args.repeat),
+        'http': lambda: bench_http(docs, labels, args.repeat, n_requests=args.requests),
+        'startup': lambda: bench_startup(docs, labels, args.repeat),
+        'tokenizers': lambda: bench_tokenizers(docs, labels, args.repeat, args.dictionary, args.userdict),
+        'serve': lambda: bench_serve(docs, labels, args.repeat, args.serve_workers, args.serve_seconds)
+    }
+    for name in args.only:
+        print(f"运行 {name} ...", file=sys.stderr)
+        start = time.perf_counter()
+        report['results'][name] = benchmarks[name]()
+        print(f"{name} 完成，用时 {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"结果已写入 {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} 项指标变差超过 {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
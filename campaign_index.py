@@ -0,0 +1,225 @@
+import atexit
+import os
+import pickle
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from config import CAMPAIGN_INDEX_CONFIG
+from verdict_cache import normalize_content
+
+_PRIME = (1 << 31) - 1
+
+# 群发变体最常改动的是链接和数字（编号、金额、验证码），生成 shingle 前统一替换
+_URL = re.compile(r'(?:https?://|www\.)[^\s\u4e00-\u9fff]+|[a-zA-Z0-9.-]+\.(?:com|cn|net|org)[^\s\u4e00-\u9fff]*', re.IGNORECASE)
+_DIGITS = re.compile(r'\d+')
+
+
+class CampaignIndex:
+    """
+    已判为垃圾邮件的内容的 MinHash LSH 索引，用来识别只改了链接、称呼等少量内容的群发垃圾邮件。
+    按插入顺序淘汰最旧的条目，可以保存到磁盘，重启后继续使用。
+    条目来自模型的判定，模型替换后全部作废（on_model_reload）；用户标记为正常邮件时用 remove() 删除与之相似的条目，
+    避免一次误判让后续相似的正常邮件都被直接判为垃圾邮件。
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.7, shingle_size=2, max_size=50000,
+                 path=None, save_every=100):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm 必须是 bands 的整数倍")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_size = max_size
+        self.path = path
+        self.save_every = save_every
+
+        rng = np.random.RandomState(20241218)
+        self._a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+        self._signatures = OrderedDict()
+        self._buckets = [{} for _ in range(bands)]
+        self._next_id = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.model_version = None  # 条目所依据的模型版本，与保存的索引一起记录
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def shingles(self, text):
+        """邮件内容的分词 shingle 集合（以 crc32 表示）；空白内容没有 shingle，返回空集合"""
+        from tokenizer import ensure_jieba
+        jieba = ensure_jieba()
+        text = _DIGITS.sub('0', _URL.sub(' URL ', normalize_content(text)))
+        tokens = [token for token in jieba.cut(text) if not token.isspace()]
+        if not tokens:
+            # 否则所有空白邮件都得到同一个签名，一封空白垃圾邮件入库后所有空白邮件都会被判为垃圾邮件
+            return set()
+        k = min(self.shingle_size, len(tokens))
+        return {zlib.crc32('\x1f'.join(tokens[i:i + k]).encode('utf-8')) for i in range(len(tokens) - k + 1)}
+
+    def signature(self, text):
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+        x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles)) % np.uint64(_PRIME)
+        hashed = (self._a[:, None] * x[None, :] + self._b[:, None]) % np.uint64(_PRIME)
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, text, signature=None):
+        """
+        返回与已知垃圾邮件的最高估计相似度（Jaccard），没有候选时返回 0.0
+        """
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return 0.0
+
+        best = 0.0
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            for entry_id in candidates:
+                similarity = float(np.mean(self._signatures[entry_id] == signature))
+                if similarity > best:
+                    best = similarity
+        return best
+
+    def is_campaign(self, text):
+        """相似度超过阈值时认为属于已知的垃圾邮件群发"""
+        return self.query(text) >= self.threshold
+
+    def insert(self, text, signature=None):
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return
+        with self._lock:
+            self._add(signature)
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def remove(self, text, signature=None):
+        """删除与 text 的估计相似度达到阈值的条目（即会让 text 被判为群发垃圾邮件的条目），返回删除的条目数"""
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return 0
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            removed = [entry_id for entry_id in candidates
+                       if float(np.mean(self._signatures[entry_id] == signature)) >= self.threshold]
+            for entry_id in removed:
+                self._discard(entry_id, self._signatures.pop(entry_id))
+            if removed:
+                self._unsaved += 1
+        return len(removed)
+
+    def clear(self):
+        with self._lock:
+            self._signatures.clear()
+            self._buckets = [{} for _ in range(self.bands)]
+            self._unsaved += 1
+
+    def on_model_reload(self, snapshot):
+        """
+        模型替换后的回调：条目是旧模型的判定结果，全部作废。
+        启动时第一次加载的模型与保存索引时的版本相同时保留索引
+        """
+        if snapshot.version == self.model_version:
+            return
+        if self.model_version is not None or len(self):
+            self.clear()
+            print("模型已更新，清空相似垃圾邮件索引")
+        self.model_version = snapshot.version
+        self.flush()
+
+    def _add(self, signature):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._signatures[entry_id] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, set()).add(entry_id)
+
+        while len(self._signatures) > self.max_size:
+            self._discard(*self._signatures.popitem(last=False))
+
+    def _discard(self, entry_id, signature):
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def flush(self):
+        """有未保存的新条目时保存"""
+        if self.path and self._unsaved:
+            self.save()
+
+    def save(self, path=None):
+        """保存签名到磁盘（写临时文件后原子替换），桶在加载时重建"""
+        path = path or self.path
+        with self._lock:
+            state = {
+                'num_perm': self.num_perm,
+                'bands': self.bands,
+                'shingle_size': self.shingle_size,
+                'model_version': self.model_version,
+                'signatures': np.array(list(self._signatures.values()), dtype=np.uint32)
+            }
+            self._unsaved = 0
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"加载相似垃圾邮件索引失败: {e}")
+            return
+        if (state['num_perm'], state['bands'], state['shingle_size']) != (self.num_perm, self.bands, self.shingle_size):
+            print("相似垃圾邮件索引参数已变化，忽略旧索引")
+            return
+        with self._lock:
+            self.model_version = state.get('model_version')
+            for signature in state['signatures'][-self.max_size:]:
+                self._add(signature)
+
+
+campaign_index = None
+if CAMPAIGN_INDEX_CONFIG.get('enabled'):
+    campaign_index = CampaignIndex(
+        num_perm=CAMPAIGN_INDEX_CONFIG['num_perm'],
+        bands=CAMPAIGN_INDEX_CONFIG['bands'],
+        threshold=CAMPAIGN_INDEX_CONFIG['threshold'],
+        shingle_size=CAMPAIGN_INDEX_CONFIG['shingle_size'],
+        max_size=CAMPAIGN_INDEX_CONFIG['max_size'],
+        path=CAMPAIGN_INDEX_CONFIG.get('path'),
+        save_every=CAMPAIGN_INDEX_CONFIG.get('save_every', 100)
+    )
+    atexit.register(campaign_index.flush)
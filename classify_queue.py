@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+
+from metrics import CLASSIFICATION_ERRORS
+from predict import predict_incoming_batch
+
+
+class ClassificationQueue:
+    """
+    异步分类队列：邮件先以待分类状态（is_spam 为 NULL）写入，
+    后台线程从队列中按小批量取出，一次向量化、一次预测，再用一条 UPDATE 写回结果。
+    队列满或分类出错时邮件保持待分类状态，由定期扫描重新放入队列；sweep_interval 为 0 时不扫描
+    （多个进程共用数据库时只需要一个进程扫描）。
+    """
+
+    def __init__(self, get_db, workers=2, batch_size=64, max_wait=0.05, max_pending=10000, sweep_interval=60):
+        self.get_db = get_db
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.sweep_interval = sweep_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._queued_ids = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+        self.classified = 0
+        self.batches = 0
+        self.errors = 0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                self._threads.append(threading.Thread(target=self._work, name=f'classify-worker-{i}', daemon=True))
+            if self.sweep_interval:
+                self._threads.append(threading.Thread(target=self._sweep, name='classify-sweeper', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, email_id, content):
+        """放入分类队列，队列已满时返回 False（邮件留待下一次扫描处理）"""
+        self.start()
+        with self._lock:
+            if email_id in self._queued_ids:
+                return True
+            self._queued_ids.add(email_id)
+        try:
+            self._queue.put_nowait((email_id, content))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._queued_ids.discard(email_id)
+            return False
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._classify(batch)
+            except Exception as e:
+                self.errors += 1
+                CLASSIFICATION_ERRORS.inc('classify_queue')
+                print(f"异步分类失败: {e}")
+            finally:
+                with self._lock:
+                    for email_id, _ in batch:
+                        self._queued_ids.discard(email_id)
+
+    def _classify(self, batch):
+        verdicts = predict_incoming_batch([content for _, content in batch])
+
+        # 一条 UPDATE 写回整批结果；已经有结果的邮件（例如用户手动标记过）不覆盖
+        ids = [email_id for email_id, _ in batch]
+        cases = ' '.join(['WHEN %s THEN %s'] * len(ids))
+        placeholders = ', '.join(['%s'] * len(ids))
+        params = []
+        for email_id, is_spam in zip(ids, verdicts):
+            params += [email_id, is_spam]
+        params += ids
+
+        conn = self.get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                UPDATE emails SET is_spam = CASE id {cases} END
+                WHERE id IN ({placeholders}) AND is_spam IS NULL
+            """, tuple(params))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        self.batches += 1
+        self.classified += len(batch)
+
+    def _sweep(self):
+        """启动时以及之后每隔 sweep_interval 秒，把数据库中仍在待分类状态的邮件重新放入队列"""
+        while True:
+            try:
+                self._requeue_pending()
+            except Exception as e:
+                print(f"扫描待分类邮件失败: {e}")
+            time.sleep(self.sweep_interval)
+
+    def _requeue_pending(self):
+        last_id = 0
+        while True:
+            conn = self.get_db()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT id, content FROM emails
+                    WHERE is_spam IS NULL AND id > %s
+                    ORDER BY id LIMIT %s
+                """, (last_id, self.batch_size * 10))
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+
+            for email_id, content in rows:
+                if not self.submit(email_id, content):
+                    return
+            if len(rows) < self.batch_size * 10:
+                return
+            last_id = rows[-1][0]
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'classified': self.classified,
+            'batches': self.batches,
+            'errors': self.errors
+        }
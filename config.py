@@ -6,4 +6,133 @@ MYSQL_CONFIG = {
     'database': 'email_system',
     'port': 3306,
     'charset': 'utf8mb4'
-} 
\ No newline at end of file
+} 
+
+# 数据库连接池配置
+DB_POOL_CONFIG = {
+    'pool_size': 5,  # 常驻的空闲连接数
+    'max_overflow': 10,  # 繁忙时允许额外创建的连接数
+    'recycle': 3600,  # 连接存活超过该秒数后重新创建，应小于 MySQL 的 wait_timeout
+    'pre_ping': True,  # 借出连接前检查连接是否可用
+    'timeout': 30  # 连接全部借出时最长等待的秒数
+}
+
+# 邮件列表分页配置
+PAGE_CONFIG = {
+    'default_size': 50,  # 未指定 limit 时每页的邮件数
+    'max_size': 200  # 每页最多的邮件数
+}
+
+# 模型文件配置
+MODEL_CONFIG = {
+    'model_path': 'model/naive_bayes_model.pkl',
+    'vectorizer_path': 'model/tfidf_vectorizer.pkl',
+    'compact_path': 'model/model.bin',  # 紧凑模型文件（mmap 打开，多进程共享内存），save_model 时同时写入，None 表示不使用
+    'reload_interval': 5,  # 检查模型文件是否更新的间隔（秒），0 表示不自动重载
+    'max_batch_size': 1000  # 批量分类接口单次最多处理的邮件数
+}
+
+# 垃圾邮件判定结果缓存配置
+VERDICT_CACHE_CONFIG = {
+    'max_size': 10000,  # 进程内缓存的最大条目数
+    'ttl': 3600,  # 缓存有效期（秒）
+    'shared_path': None  # 多个 worker 共享的 SQLite 缓存文件路径，例如 'cache/verdicts.db'，None 表示不启用
+}
+
+# 相似垃圾邮件（群发变体）索引配置
+CAMPAIGN_INDEX_CONFIG = {
+    'enabled': True,
+    'threshold': 0.7,  # 与已知垃圾邮件的估计相似度达到该值时直接判为垃圾邮件
+    'num_perm': 64,  # MinHash 签名长度
+    'bands': 16,  # LSH 分段数，num_perm 必须是它的整数倍
+    'shingle_size': 2,  # 每个 shingle 包含的词数
+    'max_size': 50000,  # 索引最多保存的垃圾邮件数，超出后淘汰最旧的
+    'path': 'cache/campaign_index.pkl',  # 持久化文件，None 表示只保存在内存中
+    'save_every': 100  # 每新增多少条保存一次
+}
+
+# 异步分类队列配置
+CLASSIFY_QUEUE_CONFIG = {
+    'enabled': False,  # 开启后发送邮件时先以待分类状态写入，由后台线程分类
+    'workers': 2,  # 后台分类线程数
+    'batch_size': 64,  # 每批最多分类的邮件数
+    'max_wait': 0.05,  # 凑批的最长等待时间（秒）
+    'max_pending': 10000,  # 队列长度上限，超出的邮件由定期扫描处理
+    'sweep_interval': 60  # 扫描数据库中待分类邮件的间隔（秒），0 表示不扫描；serve.py 只在 0 号工作进程中扫描
+}
+
+# 模型更新后重新分类已有邮件的配置
+RESCAN_CONFIG = {
+    'auto_start': False,  # 开启后服务进程加载到新模型时在后台自动重新分类
+    'chunk_size': 500,  # 每块扫描的邮件数
+    'max_rate': 2000  # 每秒最多扫描的邮件数，0 表示不限速
+}
+
+# 性能指标配置（/api/metrics）
+METRICS_CONFIG = {
+    'enabled': True,  # 关闭后不再记录耗时和计数
+    'buckets': None  # 直方图分桶上界（秒），None 表示使用 metrics.py 中的默认分桶
+}
+
+# 按请求的性能剖析配置
+PROFILING_CONFIG = {
+    'sample_rate': 0.0,  # 随机剖析的请求比例，0 表示只剖析带管理员请求头的请求
+    'header': 'X-Profile-Token',  # 请求头的值与 token 一致时剖析该请求，查看剖析结果的接口也使用该请求头
+    'token': None,  # 管理员令牌，None 表示不接受请求头触发，也不开放查看接口
+    'format': 'collapsed',  # collapsed（采样调用栈，用于火焰图）或 pstats（cProfile）
+    'interval': 0.001,  # collapsed 格式的采样间隔（秒）
+    'dir': 'cache/profiles',  # 剖析结果目录
+    'max_profiles': 50  # 最多保留的剖析结果数，超出时删除最旧的
+}
+
+# 用户反馈增量学习配置
+FEEDBACK_CONFIG = {
+    'enabled': True,  # 关闭后标记邮件只修改邮件状态，不更新模型
+    # 每次保存都是一个新的模型版本：serve.py 会重启整代工作进程，判定缓存和相似垃圾邮件索引被清空，
+    # 开启 RESCAN_CONFIG['auto_start'] 时还会重新分类全部邮件，因此保存间隔不宜过短
+    'snapshot_interval': 1800,  # 有新反馈时，每隔多少秒保存一次模型
+    'snapshot_every': 1000,  # 累计多少条反馈立即保存一次模型
+    'max_vocabulary': None,  # 词表大小上限，达到后反馈中的新词不再加入词表，None 表示不限制
+    'lock_path': 'model/.feedback.lock',  # 多个进程保存模型时使用的文件锁
+    'spool_path': 'model/.feedback_pending.jsonl'  # 暂存文件：非 owner 进程的反馈和进程退出时还没有保存的反馈
+}
+
+# 服务启动配置
+STARTUP_CONFIG = {
+    'jieba_cache_dir': 'cache/jieba',  # jieba 前缀词典缓存目录（python startup.py 预先生成），None 使用系统临时目录
+    'warm_up': True,  # 开始接受请求前加载词典和模型，并用样例邮件预热单封和批量分类
+    'warmup_texts': [
+        '关于下周项目进展的会议安排，请查收附件',
+        '恭喜您中奖了！点击链接领取100万大奖',
+        'Your account has been suspended, please verify immediately'
+    ]
+}
+
+# 多进程服务配置（python serve.py）
+SERVE_CONFIG = {
+    'host': '0.0.0.0',
+    'port': 5000,
+    'workers': None,  # 工作进程数，None 表示 CPU 核数
+    'threaded': False,  # 每个工作进程是否用多线程处理请求（等待数据库较多时开启）
+    'backlog': 2048,  # 监听队列长度
+    'gc_freeze': True,  # fork 前执行 gc.freeze()，模型对象不再被垃圾回收遍历，减少写时复制
+    'reload_on_model_change': True,  # 模型文件变化时主进程加载新模型并平滑替换工作进程；False 时各工作进程自行重新加载
+    'max_requests': 10000,  # 工作进程处理多少个请求后退出并由主进程重新 fork，0 表示不限制
+    'max_requests_jitter': 1000,  # 在 max_requests 上随机增加 0~该值，避免所有工作进程同时重启
+    'max_age': 0,  # 工作进程运行超过该秒数后退出并重新 fork，0 表示不限制
+    'graceful_timeout': 30,  # 停止或替换工作进程时等待当前请求处理完成的最长秒数，超时强制结束
+    'access_log': False  # 是否输出每个请求的访问日志
+}
+
+# SMTP 收信网关配置
+SMTP_GATEWAY_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8025,
+    'batch_size': 500,  # 每批最多写入的邮件数
+    'max_wait': 0.2,  # 凑批的最长等待时间（秒）
+    'max_pending': 5000,  # 等待写入的邮件数上限，超出后新邮件等待
+    'enqueue_timeout': 5,  # 等待进入队列的最长时间（秒），超时返回 451 让发送方重试
+    'max_message_size': 10 * 1024 * 1024,  # 单封邮件大小上限（字节）
+    'default_sender': None,  # 发件人未注册时使用的账户邮箱，None 表示拒收
+    'user_cache_size': 10000  # 缓存的收发件人地址数上限，不存在的地址只缓存 30 秒
+}
@@ -0,0 +1,323 @@
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from functools import lru_cache
+
+from metrics import DB_CONNECT_SECONDS, DB_QUERY_SECONDS
+
+
+class PoolTimeout(Exception):
+    """等待空闲连接超时"""
+
+
+class PooledConnection:
+    """
+    从连接池借出的连接，用法与原始连接相同；
+    close() 时归还连接池，而不是断开数据库连接。
+    没有 close 就被垃圾回收时，关闭底层连接并释放占用的名额，不会让连接池的容量越来越少
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._finalizer = weakref.finalize(self, pool._reclaim, raw, pool._generation)
+        self._finalizer.atexit = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        # detach 成功说明还没有归还过，重复 close 不会重复归还
+        if self._finalizer.detach() is not None:
+            self._pool._release(self._raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TimedCursor:
+    """记录每条语句执行耗时的游标包装，其余属性直接使用原始游标的"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, *args, **kwargs):
+        with DB_QUERY_SECONDS.time(query_label(sql)):
+            return self._cursor.execute(sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        with DB_QUERY_SECONDS.time(query_label(sql)):
+            return self._cursor.executemany(sql, *args, **kwargs)
+
+
+_VERB = re.compile(r'^\s*(\w+)')
+_TABLE = re.compile(r'\b(?:from|into|update|table(?:\s+if\s+(?:not\s+)?exists)?)\s+`?(\w+)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def query_label(sql):
+    """语句类型和第一个表名，例如 select_emails、insert_emails，用作耗时统计的标签"""
+    verb = _VERB.match(sql)
+    table = _TABLE.search(sql)
+    label = verb.group(1).lower() if verb else 'other'
+    return f'{label}_{table.group(1).lower()}' if table else label
+
+
+class ConnectionPool:
+    """
+    数据库连接池
+
+    pool_size      常驻的空闲连接数
+    max_overflow   繁忙时允许额外创建的连接数，归还时如果空闲连接已满则直接关闭
+    recycle        连接存活超过该秒数后重新创建（MySQL 会断开长时间空闲的连接），0 表示不回收
+    pre_ping       借出前检查连接是否可用，不可用时重新创建
+    timeout        连接全部借出时最长等待的秒数
+    """
+
+    def __init__(self, factory, pool_size=5, max_overflow=10, recycle=3600, pre_ping=True, timeout=30):
+        self.factory = factory
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        # fork 后加 1：父进程借出的连接在子进程中被回收时不计入子进程的连接数
+        self._generation = 0
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.leaked = 0
+        self.created = 0
+        self.recycled = 0
+        self.failed_pings = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._open < self.pool_size + self.max_overflow:
+                    self._open += 1
+                    raw, created_at = None, None
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"等待数据库连接超时（{self.timeout} 秒）")
+                self._cond.wait(remaining)
+
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+        try:
+            if raw is not None and self.recycle and time.time() - created_at > self.recycle:
+                self.recycled += 1
+                self._close_quietly(raw)
+                raw = None
+            if raw is not None and self.pre_ping and not self._ping(raw):
+                self.failed_pings += 1
+                self._close_quietly(raw)
+                raw = None
+            if raw is None:
+                raw = self.factory()
+                created_at = time.time()
+                self.created += 1
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        DB_CONNECT_SECONDS.observe(time.perf_counter() - start)
+        return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at):
+        # 清理未提交的事务，避免下一个请求看到上一个请求的状态
+        try:
+            raw.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            if healthy and len(self._idle) < self.pool_size:
+                self._idle.append((raw, created_at))
+                raw = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if raw is not None:
+            self._close_quietly(raw)
+
+    def _reclaim(self, raw, generation):
+        """借出的连接没有 close 就被回收：底层连接的状态未知，直接关闭，名额还给连接池"""
+        if generation != self._generation:
+            return
+        self.leaked += 1
+        print("数据库连接未归还就被回收，已关闭并释放连接池名额")
+        self._close_quietly(raw)
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _ping(raw):
+        try:
+            if hasattr(raw, 'is_connected'):
+                return raw.is_connected()
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def dispose(self):
+        """关闭所有空闲连接（例如进程退出前）"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+    def after_fork(self):
+        """
+        在 fork 出的子进程中调用：父进程的连接不能在子进程中继续使用，直接丢弃
+        （不调用 close，关闭会断开父进程仍在使用的同一个连接），锁也重新创建
+        """
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self._generation += 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'checkouts': self.checkouts,
+                'created': self.created,
+                'recycled': self.recycled,
+                'failed_pings': self.failed_pings,
+                'timeouts': self.timeouts,
+                'leaked': self.leaked,
+                'wait_seconds_total': self.wait_seconds_total,
+                'wait_seconds_max': self.wait_seconds_max,
+                'wait_seconds_avg': self.wait_seconds_total / self.checkouts if self.checkouts else 0.0
+            }
+
+
+class SQLiteCursor:
+    """模拟 mysql.connector 游标：%s 占位符，dictionary=True 时返回字典"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_to_sqlite(sql), params)
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(_to_sqlite(sql), seq_of_params)
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    基于 SQLite 的 MySQL 替身，提供应用用到的 mysql.connector 接口，
+    用于在没有 MySQL 的环境中测试连接池和接口
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self._conn.cursor(), dictionary=dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+_PLACEHOLDER = re.compile(r'%s')
+
+
+def _to_sqlite(sql):
+    return _PLACEHOLDER.sub('?', sql)
+
+
+def mysql_factory(config):
+    def connect():
+        import mysql.connector
+        return mysql.connector.connect(**config)
+    return connect
+
+
+def sqlite_factory(path):
+    def connect():
+        return SQLiteConnection(path)
+    return connect
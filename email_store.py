@@ -0,0 +1,133 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from email import message_from_bytes, policy
+
+# 列表中显示的正文摘要长度（字符数），与 emails.snippet 列的长度一致
+SNIPPET_LENGTH = 100
+
+_WHITESPACE = re.compile(r'\s+')
+_TAGS = re.compile(r'<[^>]+>')
+
+# 用户手动标记过的邮件，emails.model_version 记为该值，重新分类时不再改动
+USER_MARKED_VERSION = 'user'
+
+INSERT_EMAIL_SQL = """
+    INSERT INTO emails (sender_id, receiver_id, subject, content, snippet, is_spam)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+# 带发送时间的写入（历史邮件导入），created_at 为 NULL 时使用当前时间
+INSERT_DATED_EMAIL_SQL = """
+    INSERT INTO emails (sender_id, receiver_id, subject, content, snippet, is_spam, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP))
+"""
+
+
+def make_snippet(content):
+    """生成列表摘要：空白折叠后截取开头部分，写入时计算一次，列表接口不再读取正文"""
+    return _WHITESPACE.sub(' ', content or '').strip()[:SNIPPET_LENGTH]
+
+
+def email_row(sender_id, receiver_id, subject, content, is_spam):
+    """INSERT_EMAIL_SQL 对应的参数"""
+    return (sender_id, receiver_id, subject, content, make_snippet(content), is_spam)
+
+
+def parse_message(raw):
+    """解析邮件，返回 (主题, 正文)；只有 HTML 正文时去掉标签"""
+    return _message_text(message_from_bytes(raw, policy=policy.default))
+
+
+def parse_addressed_message(raw):
+    """解析邮件，返回 (发件人地址, 收件人地址列表, 主题, 正文, 发送时间)，收件人包括 To 和 Cc"""
+    message = message_from_bytes(raw, policy=policy.default)
+    senders = _header_addresses(message, 'from')
+    receivers = _header_addresses(message, 'to') + _header_addresses(message, 'cc')
+    subject, content = _message_text(message)
+    return (senders[0] if senders else None), receivers, subject, content, _header_date(message)
+
+
+def _header_date(message):
+    """Date 头转换为本地时间的 'YYYY-MM-DD HH:MM:SS'，没有或无法解析时返回 None"""
+    try:
+        header = message.get('date')
+        sent_at = header.datetime if header is not None else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if sent_at is None:
+        return None
+    if sent_at.tzinfo is not None:
+        sent_at = sent_at.astimezone().replace(tzinfo=None)
+    return sent_at.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _header_addresses(message, name):
+    try:
+        header = message.get(name)
+        if header is None:
+            return []
+        return [address.addr_spec for address in header.addresses if address.addr_spec]
+    except (AttributeError, IndexError, ValueError):
+        # 格式错误的地址头按没有地址处理
+        return []
+
+
+def _message_text(message):
+    subject = str(message.get('subject') or '(无主题)')[:255]
+    body = message.get_body(preferencelist=('plain', 'html'))
+    if body is None:
+        return subject, ''
+    try:
+        content = body.get_content()
+    except (LookupError, ValueError):
+        content = body.get_payload(decode=True).decode('utf-8', errors='replace')
+    if body.get_content_type() == 'text/html':
+        content = _TAGS.sub('', content)
+    return subject, content
+
+
+class UserDirectory:
+    """
+    邮箱地址到 users.id 的 LRU 缓存，未命中时查询数据库。
+    最多缓存 max_size 个地址；不存在的地址只缓存 miss_ttl 秒，
+    大量不同的地址（批量导入的发件人、SMTP 客户端随意试探的收件人）不会让缓存无限增长
+    """
+
+    def __init__(self, get_db, ttl=300, miss_ttl=30, max_size=10000):
+        self.get_db = get_db
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, address):
+        address = address.lower()
+        with self._lock:
+            entry = self._cache.get(address)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._cache.move_to_end(address)
+                    return entry[0]
+                del self._cache[address]
+
+        conn = self.get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id FROM users WHERE email = %s", (address,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+
+        user_id = row[0] if row else None
+        ttl = self.ttl if user_id is not None else self.miss_ttl
+        if ttl > 0:
+            with self._lock:
+                self._cache[address] = (user_id, time.monotonic() + ttl)
+                self._cache.move_to_end(address)
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+        return user_id
@@ -27,11 +27,13 @@ CREATE TABLE `emails`  (
   `receiver_id` int NOT NULL,
   `subject` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
   `content` text CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL,
+  `snippet` varchar(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL DEFAULT '',
   `is_spam` tinyint(1) NULL DEFAULT 0,
+  `model_version` varchar(12) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`) USING BTREE,
-  INDEX `sender_id`(`sender_id` ASC) USING BTREE,
-  INDEX `receiver_id`(`receiver_id` ASC) USING BTREE,
+  INDEX `idx_receiver_folder`(`receiver_id` ASC, `is_spam` ASC, `created_at` ASC, `id` ASC) USING BTREE,
+  INDEX `idx_sender_sent`(`sender_id` ASC, `created_at` ASC, `id` ASC) USING BTREE,
   CONSTRAINT `emails_ibfk_1` FOREIGN KEY (`sender_id`) REFERENCES `users` (`id`) ON DELETE RESTRICT ON UPDATE RESTRICT,
   CONSTRAINT `emails_ibfk_2` FOREIGN KEY (`receiver_id`) REFERENCES `users` (`id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
@@ -40,6 +42,32 @@ CREATE TABLE `emails`  (
 -- Records of emails
 -- ----------------------------
 
+-- ----------------------------
+-- Table structure for import_checkpoints
+-- ----------------------------
+DROP TABLE IF EXISTS `import_checkpoints`;
+CREATE TABLE `import_checkpoints`  (
+  `source` varchar(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `position` bigint NOT NULL,
+  `resume_at` varchar(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NULL DEFAULT NULL,
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`source`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for rescan_progress
+-- ----------------------------
+DROP TABLE IF EXISTS `rescan_progress`;
+CREATE TABLE `rescan_progress`  (
+  `model_version` varchar(12) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `last_id` int NOT NULL DEFAULT 0,
+  `scanned` int NOT NULL DEFAULT 0,
+  `changed` int NOT NULL DEFAULT 0,
+  `finished` tinyint(1) NOT NULL DEFAULT 0,
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`model_version`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for users
 -- ----------------------------
@@ -0,0 +1,247 @@
+"""
+根据用户的"标记为垃圾邮件 / 不是垃圾邮件"反馈增量更新模型
+
+每条反馈只对这一封邮件分词，新词追加到词表末尾（IDF 取现有词表中的最大值，相当于只出现过一次的词；
+HashingTfidfVectorizer 没有词表，新词直接落入已有的哈希桶），
+模型的特征计数补零列后用 MultinomialNB.partial_fit 更新，耗时为毫秒级，不需要重新读取训练语料。
+更新作用在进程内的模型副本上，定期通过 save_model 写入 model/ 目录，
+各服务进程的模型注册表检测到文件变化后自动加载。
+每次保存都是一个新的模型版本，和重新训练一样会触发 serve.py 重启工作进程、清空判定缓存和相似垃圾邮件索引，
+开启自动重新分类时还会重新扫描全部邮件，所以默认每 30 分钟或每 1000 条反馈才保存一次。
+被标记为正常邮件的邮件在标记时已经从判定缓存和相似垃圾邮件索引中移除，不必等到保存。
+
+多个进程同时接收反馈时，只有一个进程（owner，serve.py 中为 0 号工作进程）保存模型：
+其他进程把反馈追加到暂存文件（spool_path），owner 保存时一并读取、应用后清空。
+进程退出（包括 serve.py 回收工作进程）时，还没有保存的反馈同样写入暂存文件，不会因为退出产生新的模型版本。
+读写暂存文件和保存模型都先加文件锁；如果磁盘上的模型已经被重新训练替换，
+先加载磁盘上的模型，再把还没有保存的反馈重新应用一遍，不会覆盖别人的更新。
+"""
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from model_registry import registry, save_model
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def _file_lock(path):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FeedbackLearner:
+    """
+    learn(text, is_spam) 立即更新进程内的模型副本；
+    累计 snapshot_every 条或距上次保存超过 snapshot_interval 秒时保存到模型文件。
+    owner 为 False 的进程不保存模型，反馈直接追加到暂存文件，由 owner 保存
+    """
+
+    def __init__(self, snapshot_interval=1800, snapshot_every=1000, max_vocabulary=None,
+                 lock_path='model/.feedback.lock', spool_path='model/.feedback_pending.jsonl', owner=True):
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_every = snapshot_every
+        self.max_vocabulary = max_vocabulary
+        self.lock_path = lock_path
+        self.spool_path = spool_path
+        self.owner = owner
+        self._lock = threading.RLock()
+        self._model = None
+        self._vectorizer = None
+        self._base_version = None
+        self._pending = []
+        self._thread = None
+
+        self.learned = 0
+        self.spooled = 0
+        self.snapshots = 0
+        self.new_features = 0
+        self.last_update_ms = 0.0
+
+    def _ensure_copy(self):
+        """
+        以当前服务的模型为基础建立可修改的副本；
+        服务的模型已被替换（其他进程保存了反馈或重新训练）时，在新模型上重新应用还没有保存的反馈
+        """
+        snapshot = registry.get()
+        if self._model is not None and self._base_version == snapshot.version:
+            return
+        self._model = copy.deepcopy(snapshot.model)
+        self._vectorizer = copy.deepcopy(snapshot.vectorizer)
+        self._base_version = snapshot.version
+        for text, is_spam in self._pending:
+            self._apply(self._vectorizer, self._model, text, is_spam)
+
+    def _grow_vocabulary(self, vectorizer, model, ngrams):
+        """把没见过的词追加到词表末尾，模型的特征计数补零列；哈希向量器没有词表，不需要扩展"""
+        vocabulary = getattr(vectorizer, 'vocabulary_', None)
+        if vocabulary is None:
+            return 0
+        new = [ngram for ngram in dict.fromkeys(ngrams) if ngram and ngram not in vocabulary]
+        if self.max_vocabulary is not None:
+            new = new[:max(0, self.max_vocabulary - len(vocabulary))]
+        if not new:
+            return 0
+
+        for ngram in new:
+            j = len(vocabulary)
+            vocabulary[ngram] = j
+            vectorizer.index_[j] = ngram
+        idf = getattr(vectorizer, 'idf_', None)
+        if idf is not None:
+            vectorizer.idf_ = np.concatenate([idf, np.full(len(new), idf.max() if len(idf) else 1.0)])
+        feature_count = model.feature_count_
+        model.feature_count_ = np.hstack([feature_count, np.zeros((feature_count.shape[0], len(new)))])
+        model.n_features_in_ = len(vocabulary)
+        return len(new)
+
+    def _apply(self, vectorizer, model, text, is_spam):
+        added = self._grow_vocabulary(vectorizer, model, vectorizer._get_ngrams(text))
+        X = vectorizer.transform([text])
+        model.partial_fit(X, [1 if is_spam else 0])
+        return added
+
+    def learn(self, text, is_spam):
+        """用一条反馈更新模型副本，返回新增的特征数；不是 owner 时只写入暂存文件，返回 0"""
+        start = time.perf_counter()
+        if not self.owner:
+            with self._lock, _file_lock(self.lock_path):
+                self._spool([(text, is_spam)])
+            self.learned += 1
+            self.last_update_ms = (time.perf_counter() - start) * 1000
+            return 0
+        with self._lock:
+            self._ensure_copy()
+            added = self._apply(self._vectorizer, self._model, text, is_spam)
+            self._pending.append((text, is_spam))
+            self.learned += 1
+            self.new_features += added
+            should_save = len(self._pending) >= self.snapshot_every
+        self.last_update_ms = (time.perf_counter() - start) * 1000
+        self._start_timer()
+        if should_save:
+            self.snapshot()
+        return added
+
+    def snapshot(self):
+        """把本进程的更新和暂存文件中其他进程的反馈保存到模型文件，返回是否保存了新模型"""
+        if not self.owner:
+            return False
+        with self._lock:
+            with _file_lock(self.lock_path):
+                spooled = self._read_spool()
+                if not self._pending and not spooled:
+                    return False
+                # 加锁后重新检查磁盘上的模型，保证保存的是在最新模型上应用反馈的结果
+                registry.refresh()
+                self._ensure_copy()
+                try:
+                    for text, is_spam in spooled:
+                        self.new_features += self._apply(self._vectorizer, self._model, text, is_spam)
+                    save_model(self._model, self._vectorizer)
+                except Exception:
+                    # 副本中已经应用了暂存的反馈，丢弃副本，下次从当前模型重新应用，避免同一条反馈计入两次
+                    self._model = None
+                    raise
+                self._clear_spool()
+                registry.refresh()
+                self._base_version = registry.get().version
+            self._pending = []
+            self.snapshots += 1
+        print(f"已保存反馈更新后的模型，版本: {self._base_version}")
+        return True
+
+    def _spool(self, feedback):
+        """追加到暂存文件，调用方持有文件锁"""
+        directory = os.path.dirname(self.spool_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.spool_path, 'a', encoding='utf-8') as f:
+            for text, is_spam in feedback:
+                f.write(json.dumps({'text': text, 'is_spam': bool(is_spam)}, ensure_ascii=False) + '\n')
+        self.spooled += len(feedback)
+
+    def _read_spool(self):
+        try:
+            with open(self.spool_path, encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+        return [(record['text'], record['is_spam']) for record in records]
+
+    def _clear_spool(self):
+        try:
+            os.remove(self.spool_path)
+        except FileNotFoundError:
+            pass
+
+    def start(self):
+        """owner 启动时调用：开始定期保存，上次退出时暂存的反馈也会在下一次保存时写入模型"""
+        if self.owner:
+            self._start_timer()
+
+    def _start_timer(self):
+        if self._thread is not None or not self.snapshot_interval or not self.owner:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='feedback-snapshot', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            try:
+                self.snapshot()
+            except Exception as e:
+                print(f"保存反馈模型失败: {e}")
+
+    def stats(self):
+        return {
+            'learned': self.learned,
+            'pending': len(self._pending),
+            'spooled': self.spooled,
+            'owner': self.owner,
+            'snapshots': self.snapshots,
+            'new_features': self.new_features,
+            'n_features': self._vectorizer._n_columns() if self._vectorizer is not None else None,
+            'last_update_ms': self.last_update_ms,
+            'base_version': self._base_version
+        }
+
+    def flush(self):
+        """进程退出前把还没有保存的反馈写入暂存文件（不保存模型，退出不会产生新的模型版本）"""
+        try:
+            with self._lock:
+                if not self._pending:
+                    return
+                with _file_lock(self.lock_path):
+                    self._spool(self._pending)
+                self._pending = []
+        except Exception as e:
+            print(f"暂存反馈失败: {e}")
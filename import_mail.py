@@ -0,0 +1,334 @@
+# encoding=utf8
+"""
+历史邮件批量导入
+
+流式读取 mbox 文件、.eml 目录或 CNEC.csv 格式（label,content）的 CSV，
+按批交给多个子进程分类，再用 executemany 在一个事务中写入 emails 表。
+邮件的 Date 头写入 created_at，收件箱按原来的收信时间排序；没有 Date 头（以及 CSV）时使用导入时间。
+每批写入时在同一事务中记录已读取的记录数和续传位置（import_checkpoints 表）：
+mbox 和 CSV 记录字节偏移，.eml 目录记录最后一个文件名。
+中断后重新运行同一命令会直接定位到断点继续，不再重新读取和解析已导入的记录。
+同时在途的批次数有上限，收发件人地址的缓存也有上限（USER_CACHE_SIZE），内存占用与输入大小无关。
+
+用法:
+    python import_mail.py mbox archive.mbox --receiver test1@example.com
+    python import_mail.py eml ./maildir/ --sender admin@example.com --receiver test1@example.com
+    python import_mail.py csv CNEC.csv --sender spammer@example.com --receiver test1@example.com
+"""
+import argparse
+import csv
+import os
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from config import MYSQL_CONFIG, DB_POOL_CONFIG
+from db_pool import ConnectionPool, mysql_factory, sqlite_factory
+from email_store import INSERT_DATED_EMAIL_SQL, email_row, parse_addressed_message, UserDirectory
+from parallel import bounded_imap
+from predict import get_model, predict_batch
+
+CSV_SUBJECT = '(无主题)'
+
+# 缓存的收发件人地址数上限，大量不同地址的邮件不会让缓存随导入量增长
+USER_CACHE_SIZE = 10000
+
+CREATE_CHECKPOINT_SQL = """
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        source VARCHAR(512) PRIMARY KEY,
+        position BIGINT NOT NULL,
+        resume_at VARCHAR(512) NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def read_mbox(path, resume_at=None):
+    """逐封读取 mbox：以空行后的 "From " 行分隔邮件，还原正文中被转义的 ">From " 行
+
+    返回 (邮件, 下一封邮件的字节偏移)，resume_at 为上次记录的偏移时从该处开始读取。
+    """
+    lines = []
+    previous_blank = True
+    offset = int(resume_at) if resume_at else 0
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if line.startswith(b'From ') and previous_blank:
+                if lines:
+                    yield _join_mbox_lines(lines), str(offset)
+                lines = []
+            else:
+                lines.append(line)
+            offset += len(line)
+            previous_blank = not line.strip()
+        if lines:
+            yield _join_mbox_lines(lines), str(offset)
+
+
+def _join_mbox_lines(lines):
+    # 去掉分隔前的空行，并去掉 ">From "（以及 ">>From " 等）的一层转义
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return b''.join(line[1:] if line.startswith(b'>') and line.lstrip(b'>').startswith(b'From ') else line
+                    for line in lines)
+
+
+def read_eml_dir(path, resume_at=None):
+    """按文件名顺序逐个读取目录中的 .eml 文件，返回 (邮件, 文件名)；resume_at 为上次最后导入的文件名"""
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith('.eml') and (resume_at is None or name > resume_at):
+            with open(os.path.join(path, name), 'rb') as f:
+                yield f.read(), name
+
+
+def iter_mail_records(raw_messages):
+    """(邮件, 续传位置) -> (发件人地址, 收件人地址列表, 主题, 正文, 标签, 发送时间, 续传位置)
+
+    解析失败的邮件正文为空，导入时跳过。
+    """
+    for raw, resume_at in raw_messages:
+        try:
+            sender, receivers, subject, content, sent_at = parse_addressed_message(raw)
+        except Exception as e:
+            print(f"解析邮件失败: {e}")
+            sender, receivers, subject, content, sent_at = None, [], CSV_SUBJECT, '', None
+        yield sender, receivers, subject, content, None, sent_at, resume_at
+
+
+class _LineReader:
+    """按行读取二进制文件并解码，记录读到的字节偏移（文本模式迭代时不能 tell）"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+
+    def seek(self, offset):
+        self.f.seek(offset)
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode('utf-8')
+
+
+def iter_csv_records(path, resume_at=None):
+    """CNEC.csv 格式：label 列为 spam/ham，content 列为正文；没有地址和主题
+
+    csv.reader 每次只读取组成一条记录所需的行，读完一条记录时的字节偏移即为下一条记录的开始位置。
+    """
+    csv.field_size_limit(2 ** 31 - 1)
+    with open(path, 'rb') as f:
+        lines = _LineReader(f)
+        reader = csv.reader(lines)
+        fieldnames = next(reader, None)
+        if fieldnames is None:
+            return
+        if resume_at:
+            lines.seek(int(resume_at))
+        for values in reader:
+            row = dict(zip(fieldnames, values))
+            label = (row.get('label') or '').strip()
+            is_spam = label in ('1', 'spam') if label else None
+            yield None, [], CSV_SUBJECT, row.get('content') or '', is_spam, None, str(lines.offset)
+
+
+def iter_batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_snapshot = None
+
+
+def _init_worker():
+    global _snapshot
+    _snapshot = get_model()
+    _snapshot.vectorizer.prepare_tokenizer()
+
+
+def _classify_chunk(contents):
+    """子进程：整批向量化、一次预测，返回每封邮件是否为垃圾邮件"""
+    return [result['is_spam'] for result in predict_batch(contents, _snapshot)]
+
+
+class MailImporter:
+    """把邮件记录解析为 emails 表的行，分批分类写入，并在同一事务中推进断点"""
+
+    def __init__(self, get_db, source, default_sender=None, default_receiver=None, use_labels=False):
+        self.get_db = get_db
+        self.source = source
+        self.users = UserDirectory(get_db, max_size=USER_CACHE_SIZE)
+        self.default_sender = default_sender
+        self.default_receiver = default_receiver
+        self.use_labels = use_labels
+
+        self.imported = 0
+        self.skipped = 0
+
+    def ensure_checkpoint_table(self):
+        self._execute(CREATE_CHECKPOINT_SQL)
+
+    def load_checkpoint(self):
+        """返回 (已读取的记录数, 续传位置)"""
+        conn = self.get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT position, resume_at FROM import_checkpoints WHERE source = %s", (self.source,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+        return (row[0], row[1]) if row else (0, None)
+
+    def reset_checkpoint(self):
+        self._execute("DELETE FROM import_checkpoints WHERE source = %s", (self.source,))
+
+    def _execute(self, sql, params=()):
+        conn = self.get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _user_id(self, address):
+        return self.users.lookup(address) if address else None
+
+    def prepare(self, records):
+        """把一批记录转换为待写入的行 (发件人, 收件人, 主题, 正文, 标签, 发送时间)，找不到用户或正文为空的记录跳过"""
+        rows = []
+        for sender, receivers, subject, content, label, sent_at, _ in records:
+            sender_id = self._user_id(sender) or self._user_id(self.default_sender)
+            receiver_ids = [user_id for user_id in map(self._user_id, receivers) if user_id]
+            if not receiver_ids:
+                receiver_ids = [user_id for user_id in [self._user_id(self.default_receiver)] if user_id]
+            if sender_id is None or not receiver_ids or not content.strip():
+                self.skipped += 1
+                continue
+            for receiver_id in receiver_ids:
+                rows.append((sender_id, receiver_id, subject, content, label, sent_at))
+        return rows
+
+    def write(self, rows, verdicts, position, resume_at=None):
+        """整批写入邮件并更新断点，一个事务提交"""
+        params = [
+            email_row(sender_id, receiver_id, subject, content, is_spam) + (sent_at,)
+            for (sender_id, receiver_id, subject, content, _, sent_at), is_spam in zip(rows, verdicts)
+        ]
+        conn = self.get_db()
+        cursor = conn.cursor()
+        try:
+            if params:
+                cursor.executemany(INSERT_DATED_EMAIL_SQL, params)
+            # 每批的 position 都比上一批大，UPDATE 影响 0 行说明还没有断点记录
+            cursor.execute("UPDATE import_checkpoints SET position = %s, resume_at = %s, updated_at = CURRENT_TIMESTAMP "
+                           "WHERE source = %s", (position, resume_at, self.source))
+            if cursor.rowcount == 0:
+                cursor.execute("INSERT INTO import_checkpoints (source, position, resume_at) VALUES (%s, %s, %s)",
+                               (self.source, position, resume_at))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        self.imported += len(params)
+
+    def run(self, open_records, workers=None, batch_size=1000):
+        """open_records(续传位置) 返回从该位置开始的记录迭代器，续传位置为 None 时从头读取"""
+        workers = workers or os.cpu_count() or 1
+        start = time.perf_counter()
+        position, resume_at = self.load_checkpoint()
+        records = open_records(resume_at)
+        if resume_at is not None:
+            print(f"从断点继续: 已导入 {position} 条记录, 从 {resume_at} 处继续读取")
+        elif position:
+            # 旧版本的断点只有记录数，只能逐条跳过
+            print(f"从断点继续: 跳过已导入的 {position} 条记录")
+            for _ in islice(records, position):
+                pass
+
+        with Pool(workers, initializer=_init_worker) as pool:
+            pending = deque()
+
+            def tasks():
+                consumed = position
+                for batch in iter_batches(records, batch_size):
+                    consumed += len(batch)
+                    rows = self.prepare(batch)
+                    labelled = self.use_labels and all(row[4] is not None for row in rows)
+                    pending.append((rows, consumed, batch[-1][6], labelled))
+                    # 带标签的语料直接使用标签，空任务只用来保持批次顺序
+                    yield [] if labelled else [row[3] for row in rows]
+
+            for verdicts in bounded_imap(pool, _classify_chunk, tasks(), workers * 2):
+                rows, consumed, resume_at, labelled = pending.popleft()
+                if labelled:
+                    verdicts = [row[4] for row in rows]
+                self.write(rows, verdicts, consumed, resume_at)
+                position = consumed
+                elapsed = time.perf_counter() - start
+                print(f"已读取 {position} 条记录, 导入 {self.imported} 封邮件, 跳过 {self.skipped} 条, "
+                      f"{self.imported / elapsed if elapsed > 0 else 0:.0f} 封/秒")
+        return position
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入历史邮件（mbox / .eml 目录 / CSV）')
+    parser.add_argument('format', choices=['mbox', 'eml', 'csv'], help='输入格式')
+    parser.add_argument('path', help='mbox 文件、.eml 目录或 CSV 文件')
+    parser.add_argument('--sender', default=None, help='邮件中没有可识别发件人时使用的发件人邮箱')
+    parser.add_argument('--receiver', default=None, help='邮件中没有可识别收件人时使用的收件人邮箱')
+    parser.add_argument('--workers', type=int, default=None, help='分类进程数，默认为 CPU 核数')
+    parser.add_argument('--batch-size', type=int, default=1000, help='每批分类和写入的记录数')
+    parser.add_argument('--use-labels', action='store_true', help='CSV 中有 label 列时直接使用标签，不再分类')
+    parser.add_argument('--restart', action='store_true', help='忽略断点，从头导入')
+    parser.add_argument('--sqlite', default=None, help='写入 SQLite 数据库（测试用），默认写入 MySQL')
+    args = parser.parse_args()
+
+    factory = sqlite_factory(args.sqlite) if args.sqlite else mysql_factory(MYSQL_CONFIG)
+    pool = ConnectionPool(factory, **DB_POOL_CONFIG)
+
+    if args.format == 'mbox':
+        def open_records(resume_at):
+            return iter_mail_records(read_mbox(args.path, resume_at))
+    elif args.format == 'eml':
+        def open_records(resume_at):
+            return iter_mail_records(read_eml_dir(args.path, resume_at))
+    else:
+        def open_records(resume_at):
+            return iter_csv_records(args.path, resume_at)
+
+    importer = MailImporter(
+        pool.connect,
+        f"{args.format}:{os.path.abspath(args.path)}",
+        default_sender=args.sender,
+        default_receiver=args.receiver,
+        use_labels=args.use_labels
+    )
+    importer.ensure_checkpoint_table()
+    if args.restart:
+        importer.reset_checkpoint()
+    position = importer.run(open_records, workers=args.workers, batch_size=args.batch_size)
+    print(f"导入完成: 共读取 {position} 条记录, 导入 {importer.imported} 封邮件, 跳过 {importer.skipped} 条")
+
+
+if __name__ == '__main__':
+    main()
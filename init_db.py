@@ -3,7 +3,8 @@ import hashlib
 from config import MYSQL_CONFIG
 import jieba
 import numpy as np
-from predict import predict_label, TfidfVectorizer
+from predict import predict_incoming_batch, TfidfVectorizer
+from email_store import INSERT_EMAIL_SQL, email_row
 
 def init_db():
     conn = mysql.connector.connect(**MYSQL_CONFIG)
@@ -11,6 +12,8 @@ def init_db():
 
     try:
         # 先删除旧表（如果存在的话）
+        cursor.execute("DROP TABLE IF EXISTS import_checkpoints")
+        cursor.execute("DROP TABLE IF EXISTS rescan_progress")
         cursor.execute("DROP TABLE IF EXISTS emails")
         cursor.execute("DROP TABLE IF EXISTS users")
         print("旧表删除成功")
@@ -36,14 +39,42 @@ def init_db():
                 receiver_id INT NOT NULL,
                 subject VARCHAR(255) NOT NULL,
                 content TEXT NOT NULL,
+                snippet VARCHAR(100) NOT NULL DEFAULT '',
                 is_spam BOOLEAN DEFAULT FALSE,
+                model_version VARCHAR(12) NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_receiver_folder (receiver_id, is_spam, created_at, id),
+                INDEX idx_sender_sent (sender_id, created_at, id),
                 FOREIGN KEY (sender_id) REFERENCES users(id),
                 FOREIGN KEY (receiver_id) REFERENCES users(id)
             )
         """)
         print("邮件表创建成功")
 
+        # 创建批量导入的断点表（import_mail.py 使用）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS import_checkpoints (
+                source VARCHAR(512) PRIMARY KEY,
+                position BIGINT NOT NULL,
+                resume_at VARCHAR(512) NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+        print("导入断点表创建成功")
+
+        # 创建重新分类的进度表（rescan.py 使用）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rescan_progress (
+                model_version VARCHAR(12) PRIMARY KEY,
+                last_id INT NOT NULL DEFAULT 0,
+                scanned INT NOT NULL DEFAULT 0,
+                changed INT NOT NULL DEFAULT 0,
+                finished BOOLEAN NOT NULL DEFAULT FALSE,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+        print("重新分类进度表创建成功")
+
         # 添加测试账户
         test_accounts = [
             {
@@ -121,21 +152,19 @@ def init_db():
             }
         ]
 
-        # 插入测试邮件
-        for email in test_emails:
-            # 使用朴素贝叶斯模型预测是否为垃圾邮件
-            is_spam = predict_label(email['content']) == '垃圾邮件'
-            
-            cursor.execute("""
-                INSERT INTO emails (sender_id, receiver_id, subject, content, is_spam)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
+        # 使用朴素贝叶斯模型整批预测是否为垃圾邮件，再一次性插入测试邮件
+        verdicts = predict_incoming_batch([email['content'] for email in test_emails])
+        cursor.executemany(INSERT_EMAIL_SQL, [
+            email_row(
                 user_ids[email['from']],
                 user_ids[email['to']],
                 email['subject'],
                 email['content'],
                 is_spam
-            ))
+            )
+            for email, is_spam in zip(test_emails, verdicts)
+        ])
+        for email, is_spam in zip(test_emails, verdicts):
             print(f"创建邮件成功: {email['subject']} {'(垃圾邮件)' if is_spam else '(正常邮件)'}")
 
         conn.commit()
@@ -0,0 +1,200 @@
+"""
+进程内的计数器和直方图，以 Prometheus 文本格式输出（/api/metrics）
+
+记录一次观测只需要一次加锁和一次二分查找，可以在生产环境中常开；
+METRICS_CONFIG['enabled'] 为 False 时所有记录操作直接返回。
+多进程部署时每个进程各自统计。
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from config import METRICS_CONFIG
+
+ENABLED = METRICS_CONFIG.get('enabled', True)
+DEFAULT_BUCKETS = tuple(METRICS_CONFIG.get('buckets') or (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+))
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不减的计数器，labels 的取值按位置传入"""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """
+    固定分桶的直方图（单位为秒）
+    用法: with histogram.time('label'): ...  或  histogram.observe(seconds, 'label')
+    """
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签: [各分桶的计数（最后一个为 +Inf）, 总和, 次数]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels) if ENABLED else _NULL_TIMER
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labels, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+def counter(name, help, labelnames=()):
+    metric = Counter(name, help, labelnames)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    metric = Histogram(name, help, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def add_collector(collect):
+    """
+    注册在输出时才读取的指标（例如连接池的当前状态），
+    collect() 返回 [(名称, 类型, 说明, [(标签字典, 值), ...]), ...]
+    """
+    _collectors.append(collect)
+
+
+def render():
+    """Prometheus 文本格式（0.0.4）"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            print(f"读取指标失败: {e}")
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = _format_labels(labels.keys(), labels.values())
+                lines.append(f'{name}{label_text} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# 分类流程和数据库调用的各阶段耗时
+MODEL_LOAD_SECONDS = histogram(
+    'bayesmail_model_load_seconds', '读取并反序列化模型文件的耗时')
+SEGMENT_SECONDS = histogram(
+    'bayesmail_segment_seconds', '单篇文档结巴分词的耗时')
+VECTORIZE_SECONDS = histogram(
+    'bayesmail_vectorize_seconds', '向量器 transform 的耗时（包括分词）', ['method'])
+PREDICT_SECONDS = histogram(
+    'bayesmail_predict_seconds', '模型预测的耗时（scorer 包括分词和查表）', ['method'])
+DB_CONNECT_SECONDS = histogram(
+    'bayesmail_db_connect_seconds', '从连接池借出连接的耗时（包括等待和新建连接）')
+DB_QUERY_SECONDS = histogram(
+    'bayesmail_db_query_seconds', '数据库语句的执行耗时，按语句类型和表名区分', ['query'])
+HTTP_REQUEST_SECONDS = histogram(
+    'bayesmail_http_request_seconds', 'HTTP 接口的处理耗时', ['endpoint', 'method'])
+
+VERDICTS = counter(
+    'bayesmail_verdicts_total', '分类结果数，source 为 model / cache / campaign', ['verdict', 'source'])
+CLASSIFICATION_ERRORS = counter(
+    'bayesmail_classification_errors_total', '分类出错的次数（出错时按正常邮件处理或留待重试）', ['path'])
+
+
+def count_verdict(is_spam, source):
+    VERDICTS.inc('spam' if is_spam else 'ham', source)
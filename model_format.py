@@ -0,0 +1,301 @@
+"""
+紧凑的模型文件格式（model/model.bin），用 mmap 打开，不需要 pickle
+
+文件结构（所有数组按 64 字节对齐，小端序）:
+    8 字节魔数 BAYESMDL | uint32 格式版本 | uint32 头部长度 | 头部 JSON | 各数组
+头部 JSON 记录模型版本、向量器参数（包括分词器）、模型参数和各数组的偏移、类型、形状。数组:
+    table            (n, 1 + 类别数)  每行为 [idf, 各类别的对数概率]，即 LinearScorer 的权重表
+    feature_log_prob (类别数, n)      MultinomialNB 批量预测用
+    feature_count    (类别数, n)      MultinomialNB.partial_fit 增量训练用（反馈学习）
+    class_count / class_log_prior (类别数,)
+    token_offsets / token_data        按列号排列的词（UTF-8 拼接），哈希向量器没有
+    slots                             开放寻址哈希表，按 crc32 定位，存放列号，空位为 -1
+
+打开文件只需要解析头部，数组都是 mmap 上的只读视图，第一次访问时才由操作系统读入；
+fork 出的多个服务进程共享同一份页缓存，不会各自持有一份词表。
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+from sklearn.naive_bayes import MultinomialNB
+
+from predict import TfidfVectorizer, HashingTfidfVectorizer
+from scoring import LinearScorer
+from tokenizer import tokenizer_from_spec
+
+MAGIC = b'BAYESMDL'
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<8sII')
+_ALIGN = 64
+
+
+class TokenTable:
+    """mmap 中的只读词表：get(词) 返回列号，不在词表中返回 None"""
+
+    def __init__(self, mm, offsets, data_offset, slots):
+        self._mm = mm
+        self._offsets = offsets
+        self._data_offset = data_offset
+        self._slots = slots
+        self._mask = len(slots) - 1
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def get(self, token):
+        key = token.encode('utf-8')
+        mm, offsets, slots, base, mask = self._mm, self._offsets, self._slots, self._data_offset, self._mask
+        h = zlib.crc32(key) & mask
+        while True:
+            j = slots[h]
+            if j < 0:
+                return None
+            if mm[base + offsets[j]:base + offsets[j + 1]] == key:
+                return j
+            h = (h + 1) & mask
+
+    def tokens(self):
+        """按列号顺序返回全部词"""
+        mm, offsets, base = self._mm, self._offsets, self._data_offset
+        return [mm[base + offsets[j]:base + offsets[j + 1]].decode('utf-8') for j in range(len(self))]
+
+
+class MappedTfidfVectorizer(TfidfVectorizer):
+    """
+    词表和 IDF 都在 mmap 上的向量器，分词和 TF-IDF 计算与 TfidfVectorizer 相同；
+    复制或 pickle 时转换成普通的 TfidfVectorizer（反馈学习需要修改词表）
+    """
+
+    def __init__(self, table, idf, *, ngram_range=(1, 1), stop_words=None, tokenizer=None, sparse=True):
+        super().__init__(ngram_range=ngram_range, stop_words=stop_words, tokenizer=tokenizer, sparse=sparse)
+        self.table_ = table
+        self.idf_ = idf
+
+    def _n_columns(self):
+        return len(self.table_)
+
+    def _row_counts(self, ngrams):
+        counts = {}
+        lookup = self.table_.get
+        for ngram in ngrams:
+            j = lookup(ngram)
+            if j is not None:
+                counts[j] = counts.get(j, 0) + 1
+        return counts
+
+    def materialize(self):
+        """转换成词表为 dict 的 TfidfVectorizer"""
+        vectorizer = TfidfVectorizer(ngram_range=self.ngram_range, stop_words=self.stop_words,
+                                     tokenizer=self.tokenizer, sparse=self.sparse)
+        vectorizer.index_ = dict(enumerate(self.table_.tokens()))
+        vectorizer.vocabulary_ = {ngram: j for j, ngram in vectorizer.index_.items()}
+        vectorizer.idf_ = np.array(self.idf_)
+        return vectorizer
+
+    def __reduce_ex__(self, protocol):
+        # copy.deepcopy 和 pickle 都走这里，得到的是可修改、不依赖 mmap 的普通向量器
+        return self.materialize().__reduce_ex__(protocol)
+
+
+def _vectorizer_header(vectorizer):
+    """支持的向量器返回 (头部信息, 按列号排列的词)，其他向量器返回 None"""
+    if getattr(vectorizer, 'idf_', None) is None:
+        return None
+    header = {
+        'ngram_range': list(vectorizer.ngram_range),
+        'stop_words': sorted(vectorizer.stop_words) if vectorizer.stop_words is not None else None,
+        'tokenizer': vectorizer.tokenizer.spec() if vectorizer.tokenizer is not None else None,
+        'sparse': vectorizer.sparse
+    }
+    if isinstance(vectorizer, HashingTfidfVectorizer):
+        header.update(kind='hashing', n_features=vectorizer.n_features, alternate_sign=vectorizer.alternate_sign)
+        return header, None
+    if isinstance(vectorizer, MappedTfidfVectorizer):
+        tokens = vectorizer.table_.tokens()
+    elif isinstance(vectorizer, TfidfVectorizer):
+        tokens = [None] * len(vectorizer.vocabulary_)
+        for ngram, j in vectorizer.vocabulary_.items():
+            tokens[j] = ngram
+    else:
+        return None
+    header.update(kind='vocabulary', n_features=len(tokens))
+    return header, tokens
+
+
+def _token_arrays(tokens):
+    encoded = [token.encode('utf-8') for token in tokens]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    np.cumsum([len(key) for key in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    # 装填率不超过 1/2，查找平均只需比较一两次
+    size = 1 << max(3, (2 * len(encoded) - 1).bit_length())
+    mask = size - 1
+    slots = [-1] * size
+    for j, key in enumerate(encoded):
+        h = zlib.crc32(key) & mask
+        while slots[h] >= 0:
+            h = (h + 1) & mask
+        slots[h] = j
+    return offsets, data, np.array(slots, dtype='<i4')
+
+
+def write_compact(path, model, vectorizer, version):
+    """
+    写入紧凑模型文件（先写临时文件再原子替换），
+    模型不是 MultinomialNB 或向量器不是 TF-IDF 向量器时不写，返回 False
+    """
+    vectorizer_info = _vectorizer_header(vectorizer)
+    if not isinstance(model, MultinomialNB) or vectorizer_info is None:
+        return False
+    vectorizer_header, tokens = vectorizer_info
+
+    feature_log_prob = np.asarray(model.feature_log_prob_, dtype='<f8')
+    table = np.empty((feature_log_prob.shape[1], 1 + feature_log_prob.shape[0]), dtype='<f8')
+    table[:, 0] = vectorizer.idf_
+    table[:, 1:] = feature_log_prob.T
+    arrays = {
+        'table': table,
+        'feature_log_prob': feature_log_prob,
+        'feature_count': np.asarray(model.feature_count_, dtype='<f8'),
+        'class_count': np.asarray(model.class_count_, dtype='<f8'),
+        'class_log_prior': np.asarray(model.class_log_prior_, dtype='<f8')
+    }
+    if tokens is not None:
+        arrays['token_offsets'], arrays['token_data'], arrays['slots'] = _token_arrays(tokens)
+
+    header = {
+        'version': version,
+        'vectorizer': vectorizer_header,
+        'model': {'params': model.get_params(), 'classes': model.classes_.tolist()},
+        'arrays': {}
+    }
+    # 头部中的偏移量依赖头部长度，先用占位的偏移算一次长度，留出余量
+    def layout(start):
+        offset = start
+        for name, array in arrays.items():
+            offset = -(-offset // _ALIGN) * _ALIGN
+            header['arrays'][name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+            offset += array.nbytes
+        return json.dumps(header, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+    header_bytes = layout(0)
+    data_start = -(-(_PREAMBLE.size + len(header_bytes) + 256) // _ALIGN) * _ALIGN
+    header_bytes = layout(data_start)
+    assert _PREAMBLE.size + len(header_bytes) <= data_start
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp_path, path)
+    return True
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"无法写入模型文件头部: {type(value).__name__}")
+
+
+def read_header(path):
+    """只读取头部，返回 (mmap, 头部字典)"""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, format_version, header_length = _PREAMBLE.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} 不是紧凑模型文件")
+    if format_version != FORMAT_VERSION:
+        raise ValueError(f"不支持的模型文件格式版本: {format_version}")
+    header = json.loads(mm[_PREAMBLE.size:_PREAMBLE.size + header_length].decode('utf-8'))
+    return mm, header
+
+
+def load_compact(path):
+    """打开紧凑模型文件，返回 (模型, 向量器, 打分器, 版本)"""
+    mm, header = read_header(path)
+
+    def array(name):
+        spec = header['arrays'][name]
+        count = int(np.prod(spec['shape']))
+        return np.frombuffer(mm, dtype=spec['dtype'], count=count, offset=spec['offset']).reshape(spec['shape'])
+
+    table = array('table')
+    info = header['vectorizer']
+    options = {
+        'ngram_range': tuple(info['ngram_range']),
+        'stop_words': set(info['stop_words']) if info['stop_words'] is not None else None,
+        'tokenizer': tokenizer_from_spec(info.get('tokenizer')),
+        'sparse': info['sparse']
+    }
+    if info['kind'] == 'hashing':
+        vectorizer = HashingTfidfVectorizer(n_features=info['n_features'], alternate_sign=info['alternate_sign'],
+                                            **options)
+        vectorizer.idf_ = table[:, 0]
+    else:
+        if sys.byteorder != 'little':
+            raise ValueError("词表只支持小端序的机器，请使用 pickle 文件")
+        view = memoryview(mm)
+        offsets_spec = header['arrays']['token_offsets']
+        slots_spec = header['arrays']['slots']
+        offsets = view[offsets_spec['offset']:offsets_spec['offset'] + 8 * offsets_spec['shape'][0]].cast('q')
+        slots = view[slots_spec['offset']:slots_spec['offset'] + 4 * slots_spec['shape'][0]].cast('i')
+        tokens = TokenTable(mm, offsets, header['arrays']['token_data']['offset'], slots)
+        vectorizer = MappedTfidfVectorizer(tokens, table[:, 0], **options)
+
+    model = MultinomialNB(**header['model']['params'])
+    model.classes_ = np.array(header['model']['classes'])
+    model.class_count_ = array('class_count')
+    model.class_log_prior_ = array('class_log_prior')
+    model.feature_count_ = array('feature_count')
+    model.feature_log_prob_ = array('feature_log_prob')
+    model.n_features_in_ = table.shape[0]
+
+    # 两个类别为 [0, 1] 时，table 就是 LinearScorer 的权重表，直接使用 mmap 上的数据
+    if model.classes_.tolist() == [0, 1]:
+        scorer = LinearScorer(vectorizer, table, model.class_log_prior_)
+    else:
+        scorer = LinearScorer.from_model(vectorizer, model)
+    return model, vectorizer, scorer, header['version']
+
+
+def main():
+    """把已有的 pickle 模型文件转换成紧凑模型文件"""
+    import argparse
+    import joblib
+    from config import MODEL_CONFIG
+    from model_registry import model_version
+
+    parser = argparse.ArgumentParser(description='把 pickle 模型文件转换成可以 mmap 打开的紧凑模型文件')
+    parser.add_argument('--model', default=MODEL_CONFIG['model_path'], help='模型 pickle 文件')
+    parser.add_argument('--vectorizer', default=MODEL_CONFIG['vectorizer_path'], help='向量器 pickle 文件')
+    parser.add_argument('--output', default=MODEL_CONFIG.get('compact_path') or 'model/model.bin',
+                        help='输出的紧凑模型文件')
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        model_bytes = f.read()
+    with open(args.vectorizer, 'rb') as f:
+        vectorizer_bytes = f.read()
+    version = model_version(model_bytes, vectorizer_bytes)
+    model, vectorizer = joblib.load(args.model), joblib.load(args.vectorizer)
+    if not write_compact(args.output, model, vectorizer, version):
+        raise SystemExit(f"不支持转换 {type(model).__name__} / {type(vectorizer).__name__}")
+    print(f"已写入 {args.output}，版本: {version}, {os.path.getsize(args.output)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import namedtuple
+
+from config import MODEL_CONFIG
+from metrics import MODEL_LOAD_SECONDS
+from scoring import LinearScorer
+
+# 一次加载得到的模型快照，替换时整体替换，请求拿到后不会再被修改
+LoadedModel = namedtuple('LoadedModel', ['model', 'vectorizer', 'scorer', 'version', 'loaded_at'])
+
+# 首次加载时文件在读取期间被改写的最多重试次数
+LOAD_ATTEMPTS = 3
+
+
+class ModelRegistry:
+    """
+    进程内的模型注册表：模型和向量器只加载一次，
+    后台线程按文件的 mtime/大小检查更新，重新加载成功后原子替换当前快照。
+    紧凑模型文件（compact_path，见 model_format.py）存在且不比 pickle 文件旧时优先用 mmap 打开，
+    读取失败时退回 pickle 文件
+    """
+
+    def __init__(self, model_path, vectorizer_path, reload_interval=0, compact_path=None):
+        self.model_path = model_path
+        self.vectorizer_path = vectorizer_path
+        self.compact_path = compact_path
+        self.reload_interval = reload_interval
+        self._current = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._watcher = None
+
+    def get(self):
+        """返回当前模型快照，首次调用时加载模型"""
+        current = self._current
+        if current is None:
+            with self._lock:
+                if self._current is None:
+                    self._load()
+            current = self._current
+            self.start_watching()
+        return current
+
+    def refresh(self):
+        """模型文件有变化时重新加载，返回是否替换了模型"""
+        with self._lock:
+            if self._current is not None and self._file_stamp() == self._stamp:
+                return False
+            return self._load()
+
+    def add_listener(self, callback):
+        """注册模型替换后的回调，参数为新的快照"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def after_fork(self):
+        """在 fork 出的子进程中调用：当前快照保留（与父进程共享内存），锁和检查更新的线程不会被继承，重新创建"""
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def start_watching(self):
+        if self.reload_interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"检查模型更新失败: {e}")
+
+    def _file_stamp(self):
+        stamp = []
+        for path in (self.model_path, self.vectorizer_path, self.compact_path):
+            try:
+                st = os.stat(path) if path else None
+            except FileNotFoundError:
+                st = None
+            stamp.append((st.st_mtime_ns, st.st_size) if st is not None else None)
+        return tuple(stamp)
+
+    def _load(self):
+        for attempt in range(LOAD_ATTEMPTS):
+            if attempt:
+                time.sleep(0.1)
+            stamp = self._file_stamp()
+            compact = stamp[2]
+            if compact is not None and all(s is None or s[0] <= compact[0] for s in stamp[:2]):
+                try:
+                    return self._load_compact(stamp)
+                except Exception as e:
+                    if stamp[0] is None or stamp[1] is None:
+                        raise
+                    print(f"读取紧凑模型文件失败，改用 pickle 文件: {e}")
+            loaded = self._load_pickles(stamp)
+            if loaded is not None:
+                return loaded
+        raise ValueError(f"模型文件在读取期间被反复改写，{LOAD_ATTEMPTS} 次尝试后仍未能加载")
+
+    def _load_compact(self, stamp):
+        from model_format import load_compact
+
+        with MODEL_LOAD_SECONDS.time():
+            model, vectorizer, scorer, version = load_compact(self.compact_path)
+        if self._current is not None and self._current.version == version:
+            self._stamp = stamp
+            return False
+        return self._install(model, vectorizer, scorer, version, stamp)
+
+    def _load_pickles(self, stamp):
+        import joblib
+
+        with open(self.model_path, 'rb') as f:
+            model_bytes = f.read()
+        with open(self.vectorizer_path, 'rb') as f:
+            vectorizer_bytes = f.read()
+
+        # 读取期间文件被改写（训练脚本正在保存）：已有模型时保留当前快照，等下一次检查再加载；
+        # 还没有模型时返回 None，由 _load 稍后重试
+        if self._file_stamp() != stamp:
+            return None if self._current is None else False
+
+        version = model_version(model_bytes, vectorizer_bytes)
+
+        # 只是 mtime 变了而内容没变，不需要重新反序列化
+        if self._current is not None and self._current.version == version:
+            self._stamp = stamp
+            return False
+
+        with MODEL_LOAD_SECONDS.time():
+            model = joblib.load(io.BytesIO(model_bytes))
+            vectorizer = joblib.load(io.BytesIO(vectorizer_bytes))
+
+        # 两个文件不是同一次训练的产物（例如只替换了其中一个），保留旧模型
+        n_features = getattr(model, 'n_features_in_', None)
+        vocabulary = getattr(vectorizer, 'vocabulary_', None)
+        n_columns = len(vocabulary) if vocabulary is not None else getattr(vectorizer, 'n_features', None)
+        if n_features is not None and n_columns is not None and n_columns != n_features:
+            if self._current is None:
+                raise ValueError(f"模型特征数 {n_features} 与向量器特征数 {n_columns} 不一致")
+            print("模型与向量器不匹配，暂不替换")
+            return False
+
+        # 单封邮件打分用的权重表随模型一起生成
+        scorer = LinearScorer.from_model(vectorizer, model)
+        return self._install(model, vectorizer, scorer, version, stamp)
+
+    def _install(self, model, vectorizer, scorer, version, stamp):
+        # 分词词典与训练时不一致时抛出异常，保留当前模型
+        if getattr(vectorizer, 'tokenizer', None) is not None:
+            vectorizer.tokenizer.check()
+        snapshot = LoadedModel(model, vectorizer, scorer, version, time.time())
+
+        self._current = snapshot
+        self._stamp = stamp
+        print(f"模型已加载，版本: {snapshot.version}")
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"模型更新回调出错: {e}")
+        return True
+
+
+def model_version(model_bytes, vectorizer_bytes):
+    """模型版本号：两个 pickle 文件内容的 SHA-1 前 12 位，紧凑模型文件中记录的是同一个值"""
+    digest = hashlib.sha1(model_bytes)
+    digest.update(vectorizer_bytes)
+    return digest.hexdigest()[:12]
+
+
+def save_model(model, vectorizer, model_path=None, vectorizer_path=None, compact_path=None):
+    """
+    保存模型和向量器：先写临时文件再原子替换，
+    正在服务的进程不会读到写了一半的文件。
+    使用默认路径时同时写入紧凑模型文件（最后写入，保证它不比 pickle 文件旧）
+    """
+    if compact_path is None and model_path is None:
+        compact_path = MODEL_CONFIG.get('compact_path')
+    import joblib
+
+    model_path = model_path or MODEL_CONFIG['model_path']
+    vectorizer_path = vectorizer_path or MODEL_CONFIG['vectorizer_path']
+    for obj, path in ((vectorizer, vectorizer_path), (model, model_path)):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        joblib.dump(obj, tmp_path)
+        os.replace(tmp_path, path)
+
+    if compact_path:
+        from model_format import write_compact
+
+        with open(model_path, 'rb') as f:
+            model_bytes = f.read()
+        with open(vectorizer_path, 'rb') as f:
+            vectorizer_bytes = f.read()
+        if not write_compact(compact_path, model, vectorizer, model_version(model_bytes, vectorizer_bytes)):
+            # 不支持紧凑格式的模型，删除旧文件，避免加载到上一个模型
+            if os.path.exists(compact_path):
+                os.remove(compact_path)
+
+
+registry = ModelRegistry(
+    MODEL_CONFIG['model_path'],
+    MODEL_CONFIG['vectorizer_path'],
+    reload_interval=MODEL_CONFIG.get('reload_interval', 0),
+    compact_path=MODEL_CONFIG.get('compact_path')
+)
+
+
+def get_model():
+    """获取当前进程共享的模型快照"""
+    return registry.get()
@@ -0,0 +1,12 @@
+from collections import deque
+
+
+def bounded_imap(pool, func, tasks, window):
+    """按顺序返回结果，同时最多只有 window 个任务在途，避免一次把整个语料读进内存"""
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
@@ -1,50 +1,148 @@
-import jieba
+import time
+import zlib
+from numbers import Integral
 import numpy as np
-import joblib
+import scipy.sparse as sp
+from tokenizer import DEFAULT_TOKENIZER
+from model_registry import get_model, registry
+from verdict_cache import verdict_cache
+from campaign_index import campaign_index
+from metrics import (SEGMENT_SECONDS, VECTORIZE_SECONDS, PREDICT_SECONDS, CLASSIFICATION_ERRORS,
+                     count_verdict)
 
 class CountVectorizer:
-    def __init__(self, *, vocabulary=None, ngram_range=(1, 1), stop_words=None):
+    """
+    min_df / max_df: 文档频率低于 / 高于该值的词不进入词表，整数为文档数，小数为占文档总数的比例
+    max_features: 筛选后只保留总词频最高的 max_features 个词
+    tokenizer: 分词器（见 tokenizer.py），随向量器一起保存，None 表示使用自带词典的 jieba
+    """
+
+    def __init__(self, *, vocabulary=None, ngram_range=(1, 1), stop_words=None, min_df=1, max_df=1.0,
+                 max_features=None, tokenizer=None, sparse=True):
         self.vocabulary = vocabulary
         self.ngram_range = ngram_range
         self.stop_words = stop_words
+        self.min_df = min_df
+        self.max_df = max_df
+        self.max_features = max_features
+        self.tokenizer = tokenizer
+        self.sparse = sparse
+
+    def __setstate__(self, state):
+        # 兼容旧版本保存的向量器，缺少的新参数使用默认值
+        self.__dict__.update({'sparse': True, 'min_df': 1, 'max_df': 1.0, 'max_features': None, 'tokenizer': None})
+        self.__dict__.update(state)
 
     def fit_transform(self, texts):
+        return self._output(self._fit_counts(texts))
+
+    def transform(self, texts):
+        return self._output(self._count_matrix(texts))
+
+    def _fit_counts(self, texts):
+        """单遍扫描：每篇文档只分词一次，同时建立词表和统计词频"""
+        start = time.perf_counter()
         self.vocabulary_ = {}
         self.index_ = {}
-        index = 0
+        indptr = [0]
+        indices = []
+        values = []
+        n_tokens = 0
         for text in texts:
+            counts = {}
             ngrams = self._get_ngrams(text)
+            n_tokens += len(ngrams)
             for ngram in ngrams:
-                if self.vocabulary is not None and ngram not in self.vocabulary:
-                    continue
-                if ngram not in self.vocabulary_:
-                    self.vocabulary_[ngram] = index
-                    self.index_[index] = ngram
-                    index += 1
-
-        matrix = np.zeros((len(texts), len(self.vocabulary_)), dtype=int)
-        for i, text in enumerate(texts):
-            ngrams = self._get_ngrams(text)
-            for ngram in ngrams:
-                if ngram in self.vocabulary_:
-                    j = self.vocabulary_[ngram]
-                    matrix[i][j] += 1
-        return matrix
+                j = self.vocabulary_.get(ngram)
+                if j is None:
+                    if self.vocabulary is not None and ngram not in self.vocabulary:
+                        continue
+                    j = len(self.vocabulary_)
+                    self.vocabulary_[ngram] = j
+                    self.index_[j] = ngram
+                counts[j] = counts.get(j, 0) + 1
+            indices.extend(counts.keys())
+            values.extend(counts.values())
+            indptr.append(len(indices))
 
-    def transform(self, texts):
-        matrix = np.zeros((len(texts), len(self.vocabulary_)), dtype=int)
-        for i, text in enumerate(texts):
-            ngrams = self._get_ngrams(text)
-            for ngram in ngrams:
-                if ngram in self.vocabulary_:
-                    j = self.vocabulary_[ngram]
-                    matrix[i][j] += 1
-        return matrix
+        self._record_fit_stats(len(indptr) - 1, n_tokens, start)
+        return self._limit_features(_csr_matrix(values, indices, indptr, self._n_columns()))
+
+    def _limit_features(self, matrix):
+        """按 min_df / max_df / max_features 裁剪词表，返回只含保留列的词频矩阵"""
+        if self.min_df == 1 and self.max_df == 1.0 and self.max_features is None:
+            return matrix
+        df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        tf = np.asarray(matrix.sum(axis=0)).ravel()
+        keep = select_vocabulary(df, tf, matrix.shape[0], self.min_df, self.max_df, self.max_features)
+        self.restrict(keep)
+        return matrix[:, keep]
+
+    def restrict(self, keep):
+        """只保留 keep 中的特征列（升序的列号），重新编号，IDF 同步裁剪"""
+        keep = np.asarray(keep, dtype=np.int64)
+        tokens = [None] * len(self.vocabulary_)
+        for ngram, j in self.vocabulary_.items():
+            tokens[j] = ngram
+        self.index_ = {new: tokens[old] for new, old in enumerate(keep.tolist())}
+        self.vocabulary_ = {ngram: j for j, ngram in self.index_.items()}
+        idf = getattr(self, 'idf_', None)
+        if idf is not None:
+            self.idf_ = idf[keep]
+
+    def _record_fit_stats(self, n_docs, n_tokens, start):
+        elapsed = time.perf_counter() - start
+        self.fit_stats_ = {
+            'n_docs': n_docs,
+            'n_tokens': n_tokens,
+            'seconds': elapsed,
+            'tokens_per_sec': n_tokens / elapsed if elapsed > 0 else 0.0
+        }
+
+    def _n_columns(self):
+        """特征矩阵的列数"""
+        return len(self.vocabulary_)
+
+    def _count_matrix(self, texts):
+        return self._count_ngrams(self._get_ngrams(text) for text in texts)
+
+    def _count_ngrams(self, ngram_lists):
+        """统计词频，返回 CSR 稀疏矩阵，内存只与非零元素个数有关"""
+        indptr = [0]
+        indices = []
+        values = []
+        for ngrams in ngram_lists:
+            counts = self._row_counts(ngrams)
+            indices.extend(counts.keys())
+            values.extend(counts.values())
+            indptr.append(len(indices))
+        return _csr_matrix(values, indices, indptr, self._n_columns())
+
+    def _row_counts(self, ngrams):
+        """一篇文档的词频：{特征列号: 次数}"""
+        counts = {}
+        vocabulary = self.vocabulary_
+        for ngram in ngrams:
+            j = vocabulary.get(ngram)
+            if j is not None:
+                counts[j] = counts.get(j, 0) + 1
+        return counts
+
+    def _output(self, matrix):
+        return matrix if self.sparse else matrix.toarray()
+
+    def prepare_tokenizer(self):
+        """加载分词器（jieba 词典等），返回分词函数；词典加载失败时直接抛出异常，不会当作空文档处理"""
+        return (self.tokenizer or DEFAULT_TOKENIZER).prepare()
 
     def _get_ngrams(self, text):
+        tokenize = self.prepare_tokenizer()
         try:
-            words = list(jieba.cut(text))
-        except:
+            with SEGMENT_SECONDS.time():
+                words = tokenize(text)
+        except Exception:
+            # 内容不是字符串（例如 CSV 中的空值）时按空文档处理
+            CLASSIFICATION_ERRORS.inc('tokenize')
             words = ['']
         if self.stop_words is not None:
             words = [word for word in words if word not in self.stop_words]
@@ -63,37 +161,202 @@ class TfidfVectorizer(CountVectorizer):
         self.idf_ = None
 
     def fit_transform(self, texts):
-        tf_matrix = super().fit_transform(texts)
-        self.idf_ = np.log((1 + len(texts)) / (1 + np.sum(tf_matrix > 0, axis=0))) + 1
-        tfidf_matrix = tf_matrix * self.idf_
-        row_norms = np.linalg.norm(tfidf_matrix, axis=1, keepdims=True)
-        tfidf_matrix = tfidf_matrix / np.where(row_norms == 0, 1, row_norms)
-        return tfidf_matrix
+        tf_matrix = self._fit_counts(texts)
+        df = np.bincount(tf_matrix.indices, minlength=tf_matrix.shape[1])
+        self.idf_ = np.log((1 + tf_matrix.shape[0]) / (1 + df)) + 1
+        return self._output(_tfidf_l2(tf_matrix, self.idf_))
 
     def transform(self, texts):
-        tf_matrix = super().transform(texts)
-        tfidf_matrix = tf_matrix * self.idf_ if self.idf_ is not None else tf_matrix
-        row_norms = np.linalg.norm(tfidf_matrix, axis=1, keepdims=True)
-        tfidf_matrix = tfidf_matrix / np.where(row_norms == 0, 1, row_norms)
-        return tfidf_matrix
+        tf_matrix = self._count_matrix(texts)
+        return self._output(_tfidf_l2(tf_matrix, self.idf_))
 
-def predict_label(text):
+class HashingTfidfVectorizer(TfidfVectorizer):
+    """
+    特征哈希版的 TF-IDF 向量器：n-gram 用 crc32 映射到 n_features 个桶中的一个，不保存词表。
+    内存和模型文件大小只由 n_features 决定，开启二元词组或根据反馈增量更新时都不会增长，
+    新词直接落到已有的桶里，不需要重建索引。IDF 和 L2 归一化与 TfidfVectorizer 相同。
+    alternate_sign 为 True 时按哈希值的最高位给计数取正负号，冲突的词相互抵消而不是累加；
+    这样特征值会出现负数，只适用于线性模型，MultinomialNB 需要保持 False。
+    """
+
+    def __init__(self, *, n_features=2 ** 18, alternate_sign=False, ngram_range=(1, 1), stop_words=None,
+                 tokenizer=None, sparse=True):
+        super().__init__(ngram_range=ngram_range, stop_words=stop_words, tokenizer=tokenizer, sparse=sparse)
+        self.n_features = n_features
+        self.alternate_sign = alternate_sign
+
+    def _fit_counts(self, texts):
+        """没有词表需要建立，直接按桶统计词频"""
+        start = time.perf_counter()
+        totals = {'n_docs': 0, 'n_tokens': 0}
+
+        def ngram_lists():
+            for text in texts:
+                ngrams = self._get_ngrams(text)
+                totals['n_docs'] += 1
+                totals['n_tokens'] += len(ngrams)
+                yield ngrams
+
+        matrix = self._count_ngrams(ngram_lists())
+        self._record_fit_stats(totals['n_docs'], totals['n_tokens'], start)
+        return matrix
+
+    def _n_columns(self):
+        return self.n_features
+
+    def _row_counts(self, ngrams):
+        # crc32 在不同进程、不同 Python 版本中结果相同（内置 hash() 每个进程随机），训练和服务端的列号一致
+        counts = {}
+        n_features = self.n_features
+        alternate_sign = self.alternate_sign
+        for ngram in ngrams:
+            h = zlib.crc32(ngram.encode('utf-8'))
+            j = h % n_features
+            counts[j] = counts.get(j, 0) + (-1 if alternate_sign and h & 0x80000000 else 1)
+        if alternate_sign:
+            counts = {j: count for j, count in counts.items() if count}
+        return counts
+
+def select_vocabulary(df, tf, n_docs, min_df=1, max_df=1.0, max_features=None):
+    """
+    按文档频率 df 和总词频 tf（两个按列号排列的数组）筛选特征，返回保留的列号（升序）；
+    参数含义与 CountVectorizer 相同，总词频相同时保留列号小的
+    """
+    min_count = min_df if isinstance(min_df, Integral) else min_df * n_docs
+    max_count = max_df if isinstance(max_df, Integral) else max_df * n_docs
+    if min_count > max_count:
+        raise ValueError("min_df 对应的文档数大于 max_df")
+    keep = np.flatnonzero((df >= min_count) & (df <= max_count))
+    if max_features is not None and len(keep) > max_features:
+        order = np.argsort(-np.asarray(tf)[keep], kind='stable')[:max_features]
+        keep = np.sort(keep[order])
+    return keep
+
+def _csr_matrix(values, indices, indptr, n_features):
+    matrix = sp.csr_matrix(
+        (np.asarray(values, dtype=np.int64), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, n_features)
+    )
+    matrix.sort_indices()
+    return matrix
+
+def _tfidf_l2(tf_matrix, idf):
+    """在稀疏矩阵上乘以 IDF 并按行做 L2 归一化，只处理非零元素"""
+    tfidf_matrix = tf_matrix.astype(np.float64)
+    if idf is not None:
+        tfidf_matrix.data *= idf[tfidf_matrix.indices]
+    row_norms = np.sqrt(np.asarray(tfidf_matrix.multiply(tfidf_matrix).sum(axis=1)).ravel())
+    row_norms[row_norms == 0] = 1
+    tfidf_matrix.data /= np.repeat(row_norms, np.diff(tfidf_matrix.indptr))
+    return tfidf_matrix
+
+# 模型重新加载后，旧模型的判定结果缓存和相似垃圾邮件索引全部作废
+registry.add_listener(verdict_cache.on_model_reload)
+if campaign_index is not None:
+    registry.add_listener(campaign_index.on_model_reload)
+
+def predict_label(text, check_campaigns=False):
     """
     使用训练好的模型预测文本是否为垃圾邮件
+    check_campaigns 为 True 时（新邮件入库），先与已知垃圾邮件做相似度比对，
+    相似度足够高直接判为垃圾邮件；模型判为垃圾邮件的内容也会加入相似索引
     """
     try:
-        # 加载模型和向量器
-        model = joblib.load('model/naive_bayes_model.pkl')
-        vectorizer = joblib.load('model/tfidf_vectorizer.pkl')
+        # 获取进程内已加载的模型和向量器（文件更新后会自动重载）
+        snapshot = get_model()
+        
+        # 同样内容的邮件（例如群发的垃圾邮件）直接使用缓存的判定结果
+        is_spam = verdict_cache.get(text, snapshot.version)
+        if is_spam is not None:
+            count_verdict(is_spam, 'cache')
+            return '垃圾邮件' if is_spam else '正常邮件'
         
-        # 转换文本
-        X = vectorizer.transform([text])
+        # 只改了链接、称呼等少量内容的群发垃圾邮件，不再走模型
+        use_index = check_campaigns and campaign_index is not None
+        if use_index and campaign_index.is_campaign(text):
+            verdict_cache.put(text, snapshot.version, True)
+            count_verdict(True, 'campaign')
+            return '垃圾邮件'
         
-        # 预测
-        prediction = model.predict(X)
+        # 优先使用线性打分器，只计算邮件中出现的词
+        if snapshot.scorer is not None:
+            with PREDICT_SECONDS.time('scorer'):
+                is_spam = snapshot.scorer.predict(text)
+        else:
+            # 转换文本
+            with VECTORIZE_SECONDS.time('single'):
+                X = snapshot.vectorizer.transform([text])
+            
+            # 预测
+            with PREDICT_SECONDS.time('single'):
+                is_spam = bool(snapshot.model.predict(X)[0] == 1)
+        count_verdict(is_spam, 'model')
+        verdict_cache.put(text, snapshot.version, is_spam)
+        if use_index and is_spam:
+            campaign_index.insert(text)
         
         # 返回预测结果
-        return '垃圾邮件' if prediction[0] == 1 else '正常邮件'
+        return '垃圾邮件' if is_spam else '正常邮件'
     except Exception as e:
+        CLASSIFICATION_ERRORS.inc('predict_label')
         print(f"预测错误: {e}")
         return '正常邮件'  # 如果出错，默认为正常邮件
+
+def predict_batch(texts, snapshot=None):
+    """
+    批量预测：整批文本只做一次向量化和一次 predict_proba，
+    返回每条文本的预测结果和垃圾邮件概率
+    """
+    snapshot = snapshot or get_model()
+    texts = list(texts)
+    if not texts:
+        return []
+
+    with VECTORIZE_SECONDS.time('batch'):
+        X = snapshot.vectorizer.transform(texts)
+    with PREDICT_SECONDS.time('batch'):
+        probs = snapshot.model.predict_proba(X)
+    # 预测标签取概率最大的类别，与 model.predict 相同，不再重复计算联合对数似然
+    spam_probs = probs[:, list(snapshot.model.classes_).index(1)]
+    predictions = snapshot.model.classes_[probs.argmax(axis=1)]
+
+    results = []
+    for prediction, spam_prob in zip(predictions, spam_probs):
+        is_spam = prediction == 1
+        count_verdict(is_spam, 'model')
+        results.append({
+            'label': '垃圾邮件' if is_spam else '正常邮件',
+            'is_spam': bool(is_spam),
+            'spam_probability': float(spam_prob)
+        })
+    return results
+
+def predict_incoming_batch(texts):
+    """
+    新邮件的批量分类，判定流程与 predict_label(text, check_campaigns=True) 相同：
+    先查判定缓存和相似垃圾邮件索引，其余邮件一起向量化、一次预测。
+    返回每封邮件是否为垃圾邮件
+    """
+    snapshot = get_model()
+    texts = list(texts)
+    verdicts = [verdict_cache.get(text, snapshot.version) for text in texts]
+    for verdict in verdicts:
+        if verdict is not None:
+            count_verdict(verdict, 'cache')
+
+    if campaign_index is not None:
+        for i, text in enumerate(texts):
+            if verdicts[i] is None and campaign_index.is_campaign(text):
+                verdicts[i] = True
+                verdict_cache.put(text, snapshot.version, True)
+                count_verdict(True, 'campaign')
+
+    remaining = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if remaining:
+        results = predict_batch([texts[i] for i in remaining], snapshot)
+        for i, result in zip(remaining, results):
+            verdicts[i] = result['is_spam']
+            verdict_cache.put(texts[i], snapshot.version, result['is_spam'])
+            if result['is_spam'] and campaign_index is not None:
+                campaign_index.insert(texts[i])
+    return verdicts
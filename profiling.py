@@ -0,0 +1,143 @@
+"""
+按请求开启的性能剖析
+
+collapsed  采样剖析：后台线程每隔 interval 秒读取被剖析请求线程的调用栈，
+           输出 "函数;函数;函数 次数" 格式，可以直接用 flamegraph.pl / speedscope 生成火焰图
+pstats     确定性剖析：用 cProfile 记录请求处理期间的全部函数调用，
+           用 python -m pstats 或 snakeviz 查看
+
+剖析结果写入 directory 目录，最多保留 max_profiles 个文件，超出时删除最旧的。
+"""
+import cProfile
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class StackSampler:
+    """所有被剖析的请求共用一个采样线程，没有请求在剖析时线程处于等待状态"""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self._stacks = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._cond:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self, thread_id):
+        with self._cond:
+            return self._stacks.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stacks:
+                    self._cond.wait()
+                frames = sys._current_frames()
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._collapse(frame)] += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+
+class _Session:
+    __slots__ = ('kind', 'profiler', 'thread_id', 'start')
+
+
+class RequestProfiler:
+    """
+    start() 在请求开始时调用，返回剖析会话；finish() 在请求结束时调用，写入结果文件并返回文件名。
+    处理请求出错时也必须调用 finish()，否则 cProfile 保持开启，之后的请求都无法剖析
+    """
+
+    EXTENSIONS = {'collapsed': '.collapsed.txt', 'pstats': '.prof'}
+
+    def __init__(self, directory, max_profiles=50, format='collapsed', interval=0.001):
+        if format not in self.EXTENSIONS:
+            raise ValueError(f"不支持的剖析格式: {format}")
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.format = format
+        self._sampler = StackSampler(interval)
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def start(self):
+        session = _Session()
+        session.kind = self.format
+        session.start = time.perf_counter()
+        if self.format == 'pstats':
+            session.profiler = cProfile.Profile()
+            try:
+                session.profiler.enable()
+            except (ValueError, RuntimeError):
+                # 同一时刻只能有一个 cProfile（Python 3.12 起为 ValueError），已有请求在剖析时跳过
+                return None
+        else:
+            session.thread_id = threading.get_ident()
+            self._sampler.start(session.thread_id)
+        return session
+
+    def finish(self, session, label):
+        elapsed_ms = (time.perf_counter() - session.start) * 1000
+        if session.kind == 'pstats':
+            session.profiler.disable()
+        else:
+            stacks = self._sampler.stop(session.thread_id)
+
+        slug = re.sub(r'[^0-9A-Za-z]+', '_', label).strip('_') or 'root'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._sequence)}-{slug}-" \
+               f"{elapsed_ms:.0f}ms{self.EXTENSIONS[session.kind]}"
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        if session.kind == 'pstats':
+            session.profiler.dump_stats(path)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+        self._trim()
+        return name
+
+    def _trim(self):
+        """环形缓冲：只保留最新的 max_profiles 个文件"""
+        with self._lock:
+            profiles = self.list()
+            for profile in profiles[self.max_profiles:]:
+                try:
+                    os.remove(os.path.join(self.directory, profile['name']))
+                except OSError:
+                    pass
+
+    def list(self):
+        """按时间从新到旧列出已保存的剖析结果"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(tuple(self.EXTENSIONS.values())):
+                st = entry.stat()
+                profiles.append({'name': entry.name, 'size': st.st_size, 'created_at': st.st_mtime})
+        profiles.sort(key=lambda profile: (profile['created_at'], profile['name']), reverse=True)
+        return profiles
@@ -0,0 +1,222 @@
+# encoding=utf8
+"""
+模型更新后重新分类已有邮件
+
+按主键顺序分块扫描 emails 表（WHERE id > 上一块最后的 id），每块整批向量化、一次预测，
+只更新判定结果发生变化的邮件，并在这些邮件上记录做出判定的模型版本。
+emails.model_version 表示最近一次写入这封邮件判定结果的模型；新模型检查后判定不变的邮件不改写，
+哪些邮件已经被某个模型版本检查过由 rescan_progress 的 last_id 记录。
+扫描进度按模型版本记录在 rescan_progress 表中，与该块的更新在同一事务提交，
+进程中断后重新运行会从上次的位置继续；扫描过程中模型再次更新时，按新版本从头开始。
+max_rate 限制每秒扫描的邮件数，避免占满数据库影响线上请求。
+
+用法: python rescan.py  （参数见 --help，默认值见 config.py 中的 RESCAN_CONFIG）
+"""
+import argparse
+import threading
+import time
+
+from config import MYSQL_CONFIG, DB_POOL_CONFIG, RESCAN_CONFIG
+from db_pool import ConnectionPool, mysql_factory, sqlite_factory
+from email_store import USER_MARKED_VERSION
+from predict import get_model, predict_batch
+
+CREATE_PROGRESS_SQL = """
+    CREATE TABLE IF NOT EXISTS rescan_progress (
+        model_version VARCHAR(12) PRIMARY KEY,
+        last_id INT NOT NULL DEFAULT 0,
+        scanned INT NOT NULL DEFAULT 0,
+        changed INT NOT NULL DEFAULT 0,
+        finished BOOLEAN NOT NULL DEFAULT FALSE,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class RescanJob:
+    """
+    重新分类任务：run() 在当前线程中扫描到结束；
+    start() / on_model_reload() 在后台线程中执行，模型更新时自动开始新一轮扫描
+    """
+
+    def __init__(self, get_db, chunk_size=500, max_rate=2000):
+        self.get_db = get_db
+        self.chunk_size = chunk_size
+        self.max_rate = max_rate
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.version = None
+        self.last_id = 0
+        self.scanned = 0
+        self.changed = 0
+        self.finished = False
+        self.errors = 0
+
+    def ensure_progress_table(self):
+        conn = self.get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(CREATE_PROGRESS_SQL)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _load_progress(self, version, restart=False):
+        """读取该模型版本的扫描进度，没有记录时创建"""
+        conn = self.get_db()
+        cursor = conn.cursor()
+        try:
+            if restart:
+                cursor.execute("DELETE FROM rescan_progress WHERE model_version = %s", (version,))
+            cursor.execute(
+                "SELECT last_id, scanned, changed, finished FROM rescan_progress WHERE model_version = %s",
+                (version,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute("INSERT INTO rescan_progress (model_version) VALUES (%s)", (version,))
+                row = (0, 0, 0, False)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        self.version = version
+        self.last_id, self.scanned, self.changed, finished = row
+        self.finished = bool(finished)
+
+    def run(self, restart=False):
+        """扫描到表尾为止；扫描过程中模型更新时改用新版本重新扫描。返回本轮更新的邮件数"""
+        self.ensure_progress_table()
+        while True:
+            snapshot = get_model()
+            self._load_progress(snapshot.version, restart)
+            restart = False
+            if self.finished:
+                return 0
+            print(f"开始重新分类: 模型版本 {snapshot.version}, 从 id > {self.last_id} 继续")
+
+            changed_before = self.changed
+            while not self.finished:
+                if get_model().version != snapshot.version:
+                    print(f"模型已更新，停止版本 {snapshot.version} 的扫描")
+                    break
+                self._scan_chunk(snapshot)
+            else:
+                print(f"重新分类完成: 扫描 {self.scanned} 封, 更新 {self.changed} 封")
+                return self.changed - changed_before
+
+    def _scan_chunk(self, snapshot):
+        start = time.perf_counter()
+        conn = self.get_db()
+        cursor = conn.cursor()
+        try:
+            # 待分类的邮件（is_spam 为 NULL）由分类队列处理，用户手动标记过的邮件保持用户的判定
+            cursor.execute("""
+                SELECT id, content, is_spam, model_version FROM emails
+                WHERE id > %s AND is_spam IS NOT NULL
+                ORDER BY id LIMIT %s
+            """, (self.last_id, self.chunk_size))
+            rows = cursor.fetchall()
+
+            verdicts = [result['is_spam'] for result in predict_batch([row[1] for row in rows], snapshot)]
+            flipped = {True: [], False: []}
+            for (email_id, _, is_spam, model_version), verdict in zip(rows, verdicts):
+                if bool(is_spam) != verdict and model_version != USER_MARKED_VERSION:
+                    flipped[verdict].append(email_id)
+
+            # 只改写判定结果变化的邮件；条件中带上旧值，期间被改动过的邮件不覆盖
+            changed = 0
+            for verdict, ids in flipped.items():
+                if not ids:
+                    continue
+                placeholders = ', '.join(['%s'] * len(ids))
+                cursor.execute(f"""
+                    UPDATE emails SET is_spam = %s, model_version = %s
+                    WHERE id IN ({placeholders}) AND is_spam = %s
+                      AND (model_version IS NULL OR model_version <> %s)
+                """, (verdict, snapshot.version, *ids, not verdict, USER_MARKED_VERSION))
+                changed += cursor.rowcount
+
+            last_id = rows[-1][0] if rows else self.last_id
+            finished = len(rows) < self.chunk_size
+            cursor.execute("""
+                UPDATE rescan_progress
+                SET last_id = %s, scanned = scanned + %s, changed = changed + %s, finished = %s,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE model_version = %s
+            """, (last_id, len(rows), changed, finished, snapshot.version))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        self.last_id = last_id
+        self.scanned += len(rows)
+        self.changed += changed
+        self.finished = finished
+
+        # 限速：每块至少用 len(rows) / max_rate 秒
+        if self.max_rate and rows:
+            delay = len(rows) / self.max_rate - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+    def start(self):
+        """启动后台线程并立即开始一轮扫描"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='rescan', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def on_model_reload(self, snapshot):
+        """模型注册表的回调：新模型加载后开始重新分类"""
+        self.start()
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self.run()
+            except Exception as e:
+                self.errors += 1
+                print(f"重新分类失败: {e}")
+
+    def stats(self):
+        return {
+            'model_version': self.version,
+            'last_id': self.last_id,
+            'scanned': self.scanned,
+            'changed': self.changed,
+            'finished': self.finished,
+            'errors': self.errors
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用当前模型重新分类已有邮件，只更新判定结果变化的邮件')
+    parser.add_argument('--chunk-size', type=int, default=RESCAN_CONFIG['chunk_size'], help='每块扫描的邮件数')
+    parser.add_argument('--max-rate', type=float, default=RESCAN_CONFIG['max_rate'],
+                        help='每秒最多扫描的邮件数，0 表示不限速')
+    parser.add_argument('--restart', action='store_true', help='忽略当前模型版本的进度，从头扫描')
+    parser.add_argument('--sqlite', default=None, help='使用 SQLite 数据库（测试用），默认使用 MySQL')
+    args = parser.parse_args()
+
+    factory = sqlite_factory(args.sqlite) if args.sqlite else mysql_factory(MYSQL_CONFIG)
+    pool = ConnectionPool(factory, **DB_POOL_CONFIG)
+    job = RescanJob(pool.connect, chunk_size=args.chunk_size, max_rate=args.max_rate)
+    job.run(restart=args.restart)
+    if job.finished:
+        print(f"模型版本 {job.version}: 共扫描 {job.scanned} 封, 更新 {job.changed} 封")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class LinearScorer:
+    """
+    单封邮件的线性打分器
+
+    把向量器的 IDF 和 MultinomialNB 的 feature_log_prob_ / class_log_prior_
+    合并成一张按特征列排列的权重表（每行为 [idf, 正常邮件对数概率, 垃圾邮件对数概率]），
+    打分时只查询邮件中出现的词，不构造 1×V 的矩阵，耗时只与邮件长度有关。
+    计算步骤与 TfidfVectorizer.transform + MultinomialNB.predict_proba 相同，结果一致。
+    """
+
+    def __init__(self, vectorizer, table, class_log_prior):
+        self.vectorizer = vectorizer
+        self.table = table
+        self.class_log_prior = class_log_prior
+
+    @classmethod
+    def from_model(cls, vectorizer, model):
+        """从训练好的向量器和模型导出权重表，不支持的模型返回 None"""
+        classes = list(getattr(model, 'classes_', []))
+        if not hasattr(model, 'feature_log_prob_') or sorted(classes) != [0, 1]:
+            return None
+
+        ham, spam = classes.index(0), classes.index(1)
+        n_features = model.feature_log_prob_.shape[1]
+        idf = getattr(vectorizer, 'idf_', None)
+        if idf is None:
+            idf = np.ones(n_features)
+
+        table = np.empty((n_features, 3), dtype=np.float64)
+        table[:, 0] = idf
+        table[:, 1] = model.feature_log_prob_[ham]
+        table[:, 2] = model.feature_log_prob_[spam]
+        class_log_prior = np.array([model.class_log_prior_[ham], model.class_log_prior_[spam]])
+        return cls(vectorizer, table, class_log_prior)
+
+    def joint_log_likelihood(self, text):
+        """返回 [正常邮件, 垃圾邮件] 的联合对数似然"""
+        counts = self.vectorizer._row_counts(self.vectorizer._get_ngrams(text))
+        if not counts:
+            return self.class_log_prior.copy()
+
+        # 与 CSR 矩阵一致，按列号顺序累加
+        cols = np.fromiter(sorted(counts), dtype=np.int64, count=len(counts))
+        rows = self.table[cols]
+        tfidf = np.fromiter((counts[j] for j in cols), dtype=np.float64, count=len(cols)) * rows[:, 0]
+        norm = np.sqrt(np.dot(tfidf, tfidf))
+        if norm != 0:
+            tfidf /= norm
+        return tfidf @ rows[:, 1:] + self.class_log_prior
+
+    def spam_log_odds(self, text):
+        jll = self.joint_log_likelihood(text)
+        return jll[1] - jll[0]
+
+    def predict_proba(self, text):
+        """返回垃圾邮件概率"""
+        jll = self.joint_log_likelihood(text)
+        log_norm = np.logaddexp(jll[0], jll[1])
+        return float(np.exp(jll[1] - log_norm))
+
+    def predict(self, text):
+        """返回是否为垃圾邮件；两类得分相同时与 sklearn 一样判为正常邮件"""
+        jll = self.joint_log_likelihood(text)
+        return bool(jll[1] > jll[0])
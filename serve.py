@@ -0,0 +1,399 @@
+# encoding=utf8
+"""
+生产环境的多进程服务入口（prefork）
+
+主进程导入 app.py，加载模型和分词词典并预热（startup.prepare），执行 gc.freeze() 后 fork 出 workers 个工作进程，
+工作进程共用主进程监听的端口，各自处理请求。模型对象在 fork 之前已经创建，工作进程以写时复制的方式共享这部分内存
+（紧凑模型文件本身是 mmap 打开的，各进程共享同一份页缓存）；gc.freeze() 让垃圾回收不再遍历这些对象，
+避免改写对象头导致内存页被复制。session 密钥也在 fork 之前生成，各工作进程一致，登录状态在进程之间通用。
+
+模型更新：主进程每隔 MODEL_CONFIG['reload_interval'] 秒检查模型文件，有变化时在主进程中加载新模型并预热，
+再 fork 一组新的工作进程，旧的工作进程处理完手上的请求后退出（平滑重载），工作进程自己不检查模型文件。
+工作进程回收：处理 max_requests（加上随机的 0~max_requests_jitter）个请求或运行超过 max_age 秒后退出，主进程补上新的进程。
+只需要一个进程执行的后台任务（待分类邮件的定期扫描、模型更新后的重新分类、相似垃圾邮件索引的保存、
+反馈学习的模型保存）由 0 号工作进程负责；工作进程退出时反馈只写入暂存文件，不会因为回收或替换产生新的模型版本。
+
+信号：SIGHUP 重新检查模型文件并平滑替换全部工作进程；SIGTERM / SIGINT 停止服务，
+等待工作进程处理完当前请求后退出，超过 graceful_timeout 秒强制结束。
+
+用法: python serve.py  （参数见 --help，默认值见 config.py 中的 SERVE_CONFIG；需要 os.fork，Windows 上请使用 python app.py）
+"""
+import argparse
+import gc
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import BaseWSGIServer, ThreadedWSGIServer, WSGIRequestHandler
+
+from config import SERVE_CONFIG, MODEL_CONFIG, DB_POOL_CONFIG, RESCAN_CONFIG, STARTUP_CONFIG
+
+# 工作进程启动后这么多秒内异常退出时，等待一段时间再重新 fork，避免启动即崩溃时反复 fork
+WORKER_BOOT_SECONDS = 1.0
+
+
+class RequestHandler(WSGIRequestHandler):
+    """
+    不使用 keep-alive，每个连接处理一个请求后关闭：单线程的工作进程不会被一个空闲的长连接占住，
+    工作进程退出时也不需要等待客户端断开
+    """
+
+    protocol_version = 'HTTP/1.0'
+    access_log = False
+
+    def log_request(self, *args, **kwargs):
+        if self.access_log:
+            super().log_request(*args, **kwargs)
+
+
+class PreforkServer:
+    """
+    主进程：持有监听端口和已加载的模型，负责 fork、回收和替换工作进程。
+    工作进程按槽位编号（0 ~ workers-1），模型重载时换一代（generation），旧一代的进程收到 SIGTERM 后退出
+    """
+
+    def __init__(self, app_module, sock, workers, threaded=False, reload_on_model_change=True,
+                 check_interval=5, max_requests=0, max_requests_jitter=0, max_age=0, graceful_timeout=30,
+                 gc_freeze=True, access_log=False):
+        self.app_module = app_module
+        self.sock = sock
+        self.workers = workers
+        self.threaded = threaded
+        self.reload_on_model_change = reload_on_model_change
+        self.check_interval = check_interval
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_age = max_age
+        self.graceful_timeout = graceful_timeout
+        self.gc_freeze = gc_freeze
+        self.access_log = access_log
+
+        self._children = {}  # pid -> (槽位, 代, 启动时间)
+        self._generation = 0
+        self._stopping = False
+        self._reload_requested = False
+        self._next_spawn = 0.0
+        self._wakeup_r = self._wakeup_w = None
+
+        self.spawned = 0
+        self.reloads = 0
+
+    # ---------- 主进程 ----------
+
+    def run(self):
+        """预热、fork 工作进程，然后监控到收到停止信号为止"""
+        from model_registry import registry
+
+        self._install_signals()
+        if self.reload_on_model_change:
+            # 模型文件由主进程检查，工作进程不启动各自的检查线程，也不各自加载一份模型
+            registry.reload_interval = 0
+        # 模型更新后的重新分类只需要一个进程执行，交给 0 号工作进程；fork 之前主进程不能有后台线程
+        registry.remove_listener(self.app_module.rescan_job.on_model_reload)
+
+        self._prepare()
+        print(f"主进程 {os.getpid()} 监听 {self._address()}，启动 {self.workers} 个工作进程")
+        last_check = time.monotonic()
+        while not self._stopping:
+            self._spawn_missing()
+            self._wait(1.0)
+            self._reap()
+            if self._stopping:
+                break
+            if self._reload_requested:
+                self._reload_requested = False
+                self._reload(force=True)
+                last_check = time.monotonic()
+            elif self.reload_on_model_change and time.monotonic() - last_check >= self.check_interval:
+                self._reload(force=False)
+                last_check = time.monotonic()
+        self._shutdown()
+
+    def _address(self):
+        host, port = self.sock.getsockname()[:2]
+        return f'http://{host}:{port}'
+
+    def _prepare(self):
+        import startup
+
+        phases = startup.prepare()
+        print('启动准备完成: ' + ', '.join(f'{phase} {seconds:.2f}s' for phase, seconds in phases.items()))
+        self._freeze()
+
+    def _freeze(self):
+        if self.gc_freeze:
+            gc.unfreeze()
+            gc.collect()
+            gc.freeze()
+
+    def _reload(self, force):
+        """模型文件有变化时在主进程中加载新模型，再换一代工作进程；force 为 True 时模型没有变化也替换"""
+        import startup
+        from model_registry import registry
+
+        try:
+            changed = registry.refresh()
+            if changed:
+                snapshot = registry.get()
+                snapshot.vectorizer.prepare_tokenizer()
+                startup.warm_up(snapshot, STARTUP_CONFIG['warmup_texts'])
+        except Exception as e:
+            print(f"加载新模型失败，继续使用当前模型: {e}")
+            changed = False
+        if not changed and not force:
+            return
+
+        self._freeze()
+        self._generation += 1
+        self.reloads += 1
+        print(f"平滑替换工作进程（第 {self._generation} 代，模型版本 {registry.get().version}）")
+        old = [pid for pid, (_, generation, _) in self._children.items() if generation < self._generation]
+        self._spawn_missing()
+        for pid in old:
+            self._signal(pid, signal.SIGTERM)
+
+    def _spawn_missing(self):
+        if self._stopping or time.monotonic() < self._next_spawn:
+            return
+        occupied = {slot for slot, generation, _ in self._children.values() if generation == self._generation}
+        for slot in range(self.workers):
+            if slot not in occupied:
+                self._spawn(slot)
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._run_worker(slot)
+            except Exception:
+                import traceback
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        self._children[pid] = (slot, self._generation, time.monotonic())
+        self.spawned += 1
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            child = self._children.pop(pid, None)
+            if child is None:
+                continue
+            slot, generation, started = child
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0 and not self._stopping:
+                print(f"工作进程 {pid}（槽位 {slot}）异常退出，退出码 {code}")
+                if time.monotonic() - started < WORKER_BOOT_SECONDS:
+                    self._next_spawn = time.monotonic() + WORKER_BOOT_SECONDS
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _shutdown(self):
+        """通知所有工作进程退出，超过 graceful_timeout 秒仍未退出的强制结束"""
+        print(f"正在停止 {len(self._children)} 个工作进程")
+        for pid in list(self._children):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._children and time.monotonic() < deadline:
+            self._wait(0.1)
+            self._reap()
+        for pid in list(self._children):
+            self._signal(pid, signal.SIGKILL)
+        while self._children:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self._children.pop(pid, None)
+        self.sock.close()
+
+    def _install_signals(self):
+        # 信号处理函数只设置标志，主循环通过 wakeup fd 立即醒来处理
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        signal.set_wakeup_fd(self._wakeup_w)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _wait(self, timeout):
+        try:
+            readable, _, _ = select.select([self._wakeup_r], [], [], timeout)
+        except InterruptedError:
+            return
+        if readable:
+            try:
+                while os.read(self._wakeup_r, 512):
+                    pass
+            except BlockingIOError:
+                pass
+
+    # ---------- 工作进程 ----------
+
+    def _run_worker(self, slot):
+        """在 fork 出的子进程中执行，返回退出码"""
+        self._reset_after_fork()
+        app_module = self.app_module
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+        from campaign_index import campaign_index
+        from model_registry import registry
+
+        if slot != 0:
+            # 数据库中待分类邮件的定期扫描只在 0 号进程中执行，避免同一批邮件被每个工作进程各放入队列分类一次
+            if app_module.classify_queue is not None:
+                app_module.classify_queue.sweep_interval = 0
+            # 相似垃圾邮件索引只由 0 号进程保存，其他进程的索引只在进程内使用，不会互相覆盖同一个文件
+            if campaign_index is not None:
+                campaign_index.path = None
+            # 反馈学习的模型只由 0 号进程保存，其他进程的反馈写入暂存文件
+            if app_module.feedback_learner is not None:
+                app_module.feedback_learner.owner = False
+        elif app_module.feedback_learner is not None:
+            app_module.feedback_learner.start()
+        if slot == 0 and RESCAN_CONFIG['auto_start']:
+            # 当前模型版本已经扫描完成时 run() 直接返回；各工作进程自行重新加载模型时，由 0 号进程负责重新分类
+            app_module.rescan_job.start()
+            if not self.reload_on_model_change:
+                registry.add_listener(app_module.rescan_job.on_model_reload)
+        registry.start_watching()
+        if app_module.classify_queue is not None:
+            app_module.classify_queue.start()
+
+        server = self._make_server()
+        handled = [0]
+        wsgi_app = server.app
+
+        def counting_app(environ, start_response):
+            handled[0] += 1
+            return wsgi_app(environ, start_response)
+
+        server.app = counting_app
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else None
+        deadline = time.monotonic() + self.max_age if self.max_age else None
+        try:
+            while not stopping:
+                if limit is not None and handled[0] >= limit:
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                server.handle_request()
+        finally:
+            server.server_close()  # 多线程模式下等待处理中的请求完成
+            self._flush()
+        return 0
+
+    def _reset_after_fork(self):
+        """子进程不继承主进程的信号处理和后台线程；连接池、判定缓存和模型注册表的锁和连接重新创建"""
+        from model_registry import registry
+        from verdict_cache import verdict_cache
+
+        signal.set_wakeup_fd(-1)
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C 由主进程统一处理
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        self._children = {}
+
+        self.app_module.db_pool.after_fork()
+        registry.after_fork()
+        verdict_cache.after_fork()
+        if self.gc_freeze:
+            gc.enable()
+
+    def _make_server(self):
+        RequestHandler.access_log = self.access_log
+        host, port = self.sock.getsockname()[:2]
+        server_class = ThreadedWSGIServer if self.threaded else BaseWSGIServer
+        server = server_class(host, port, self.app_module.app, RequestHandler, fd=self.sock.fileno())
+        server.timeout = 1.0  # handle_request 最多等待 1 秒，之后检查是否需要退出
+        server.daemon_threads = False
+        return server
+
+    def _flush(self):
+        """os._exit 不执行 atexit，退出前把还没有保存的反馈写入暂存文件，并保存相似垃圾邮件索引（只有 0 号进程的索引会写入文件）"""
+        from campaign_index import campaign_index
+
+        feedback_learner = self.app_module.feedback_learner
+        if feedback_learner is not None:
+            feedback_learner.flush()
+        if campaign_index is not None:
+            campaign_index.flush()
+
+
+def listen(host, port, backlog):
+    """
+    创建监听端口，设置为非阻塞：多个工作进程同时被唤醒时，没有抢到连接的进程 accept 立即返回，
+    不会阻塞在 accept 上
+    """
+    sock = socket.create_server((host, port), backlog=backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程服务：主进程加载模型后 fork 工作进程，共享模型内存')
+    parser.add_argument('--host', default=SERVE_CONFIG['host'], help='监听地址')
+    parser.add_argument('--port', type=int, default=SERVE_CONFIG['port'], help='监听端口')
+    parser.add_argument('--workers', type=int, default=SERVE_CONFIG['workers'], help='工作进程数，默认为 CPU 核数')
+    parser.add_argument('--threaded', action='store_true', default=SERVE_CONFIG['threaded'],
+                        help='工作进程用多线程处理请求')
+    parser.add_argument('--sqlite', default=None, help='使用 SQLite 数据库（测试用），默认使用 MySQL')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        print("serve.py 需要 os.fork，Windows 上请使用 python app.py")
+        sys.exit(1)
+
+    if SERVE_CONFIG['gc_freeze']:
+        # 加载模型期间不做垃圾回收，新建的对象留在年轻代，fork 前由 gc.freeze() 统一移出
+        gc.disable()
+    import app as app_module
+    from db_pool import ConnectionPool, sqlite_factory
+
+    if args.sqlite:
+        app_module.db_pool = ConnectionPool(sqlite_factory(args.sqlite), **DB_POOL_CONFIG)
+
+    server = PreforkServer(
+        app_module,
+        listen(args.host, args.port, SERVE_CONFIG['backlog']),
+        workers=args.workers or os.cpu_count() or 1,
+        threaded=args.threaded,
+        reload_on_model_change=SERVE_CONFIG['reload_on_model_change'] and MODEL_CONFIG['reload_interval'] > 0,
+        check_interval=MODEL_CONFIG['reload_interval'],
+        max_requests=SERVE_CONFIG['max_requests'],
+        max_requests_jitter=SERVE_CONFIG['max_requests_jitter'],
+        max_age=SERVE_CONFIG['max_age'],
+        graceful_timeout=SERVE_CONFIG['graceful_timeout'],
+        gc_freeze=SERVE_CONFIG['gc_freeze'],
+        access_log=SERVE_CONFIG['access_log']
+    )
+    server.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# encoding=utf8
+"""
+本地 SMTP 收信网关
+
+接收 RFC 822 邮件，把收件人映射到 users.id，按时间和数量凑批：
+每批做一次向量化分类，再用 executemany 在一个事务中写入 emails 表。
+批次写入提交后才向客户端返回 250；数据库跟不上时队列会满，
+新邮件等待超时后返回 451，由发送方稍后重试。
+
+用法: python smtp_gateway.py  （监听地址见 config.py 中的 SMTP_GATEWAY_CONFIG）
+依赖: pip install aiosmtpd
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from config import MYSQL_CONFIG, DB_POOL_CONFIG, SMTP_GATEWAY_CONFIG
+from db_pool import ConnectionPool, mysql_factory
+from email_store import INSERT_EMAIL_SQL, email_row, parse_message, UserDirectory
+from predict import predict_incoming_batch
+
+
+class BatchWriter:
+    """
+    把收到的邮件凑成批次：达到 batch_size 封或等待超过 max_wait 秒就写入一批。
+    同一时刻只有一个批次在写数据库，队列长度上限形成背压
+    """
+
+    def __init__(self, get_db, batch_size=500, max_wait=0.2, max_pending=5000):
+        self.get_db = get_db
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        # 分类和写库放在独立线程中执行，不占用事件循环，也不和地址查询争用默认线程池
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='smtp-writer')
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    async def submit(self, rows, timeout):
+        """放入队列并等待所在批次写入完成；队列一直满时抛出 asyncio.TimeoutError"""
+        future = asyncio.get_running_loop().create_future()
+        await asyncio.wait_for(self.queue.put((rows, future)), timeout)
+        await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            n_rows = len(batch[0][0])
+            while n_rows < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+
+            rows = [row for item_rows, _ in batch for row in item_rows]
+            try:
+                await loop.run_in_executor(self._executor, self._write, rows)
+            except Exception as e:
+                self.failed += len(rows)
+                print(f"写入邮件批次失败: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.written += len(rows)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _write(self, rows):
+        """在线程池中执行：整批分类一次，executemany 写入，一个事务提交"""
+        verdicts = predict_incoming_batch([content for _, _, _, content in rows])
+        params = [
+            email_row(sender_id, receiver_id, subject, content, is_spam)
+            for (sender_id, receiver_id, subject, content), is_spam in zip(rows, verdicts)
+        ]
+
+        conn = self.get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(INSERT_EMAIL_SQL, params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+
+class GatewayHandler:
+    """aiosmtpd 的处理器：校验发件人和收件人，把邮件交给 BatchWriter"""
+
+    def __init__(self, users, writer, default_sender=None, enqueue_timeout=5):
+        self.users = users
+        self.writer = writer
+        self.default_sender = default_sender
+        self.enqueue_timeout = enqueue_timeout
+
+    async def _lookup(self, address):
+        return await asyncio.get_running_loop().run_in_executor(None, self.users.lookup, address)
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        sender_id = await self._lookup(address)
+        if sender_id is None and self.default_sender:
+            sender_id = await self._lookup(self.default_sender)
+        if sender_id is None:
+            return '550 5.7.1 Sender not registered'
+        envelope.mail_from = address
+        envelope.mail_options.extend(mail_options)
+        envelope.sender_id = sender_id
+        return '250 OK'
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        receiver_id = await self._lookup(address)
+        if receiver_id is None:
+            return '550 5.1.1 User unknown'
+        envelope.rcpt_tos.append(address)
+        envelope.rcpt_options.extend(rcpt_options)
+        if not hasattr(envelope, 'receiver_ids'):
+            envelope.receiver_ids = []
+        envelope.receiver_ids.append(receiver_id)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        try:
+            subject, content = parse_message(envelope.original_content or envelope.content)
+        except Exception as e:
+            print(f"解析邮件失败: {e}")
+            return '554 5.6.0 Malformed message'
+        if not content:
+            return '554 5.6.0 Empty message body'
+
+        # 每个收件人一行
+        rows = [(envelope.sender_id, receiver_id, subject, content) for receiver_id in envelope.receiver_ids]
+        try:
+            await self.writer.submit(rows, self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            return '451 4.3.2 Server busy, try again later'
+        except Exception:
+            return '451 4.3.0 Temporary failure, try again later'
+        return '250 Message accepted for delivery'
+
+
+async def serve(host, port):
+    from aiosmtpd.smtp import SMTP
+
+    pool = ConnectionPool(mysql_factory(MYSQL_CONFIG), **DB_POOL_CONFIG)
+    writer = BatchWriter(
+        pool.connect,
+        batch_size=SMTP_GATEWAY_CONFIG['batch_size'],
+        max_wait=SMTP_GATEWAY_CONFIG['max_wait'],
+        max_pending=SMTP_GATEWAY_CONFIG['max_pending']
+    )
+    handler = GatewayHandler(
+        UserDirectory(pool.connect, max_size=SMTP_GATEWAY_CONFIG.get('user_cache_size', 10000)),
+        writer,
+        default_sender=SMTP_GATEWAY_CONFIG.get('default_sender'),
+        enqueue_timeout=SMTP_GATEWAY_CONFIG['enqueue_timeout']
+    )
+
+    loop = asyncio.get_running_loop()
+    writer_task = asyncio.create_task(writer.run())
+    server = await loop.create_server(
+        lambda: SMTP(handler, data_size_limit=SMTP_GATEWAY_CONFIG['max_message_size'], decode_data=False),
+        host=host, port=port
+    )
+    print(f"SMTP 网关已启动: {host}:{port}")
+    try:
+        await server.serve_forever()
+    finally:
+        writer_task.cancel()
+
+
+if __name__ == '__main__':
+    asyncio.run(serve(SMTP_GATEWAY_CONFIG['host'], SMTP_GATEWAY_CONFIG['port']))
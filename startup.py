@@ -0,0 +1,84 @@
+"""
+服务启动准备：在开始接受请求前加载模型和分词词典，并预热分类
+
+jieba 第一次分词时要构建前缀词典（没有缓存时需要数秒），如果不预先加载，这部分时间会落在第一个请求上。
+prepare() 依次加载模型、加载模型记录的分词器（jieba 读取 STARTUP_CONFIG['jieba_cache_dir'] 中的缓存，
+没有时构建并写入），再用 warmup_texts 中的样例邮件各走一遍单封打分和批量预测。
+各阶段耗时和启动后第一个请求的耗时通过 /api/metrics 输出。
+
+用法: python startup.py  （部署时预先生成 jieba 词典缓存，并输出各阶段耗时）
+"""
+import time
+
+import metrics
+from config import STARTUP_CONFIG
+
+# 本模块由 app.py 最先导入，从这里开始计算导入耗时
+IMPORT_STARTED = time.perf_counter()
+
+_phases = {}
+_first_request_seconds = None
+
+
+def _timed(phase, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    _phases[phase] = time.perf_counter() - start
+    return result
+
+
+def mark_imported():
+    """app.py 导入完成时调用"""
+    _phases['import'] = time.perf_counter() - IMPORT_STARTED
+
+
+def warm_up(snapshot, texts):
+    """单封打分和批量预测各执行一遍；不经过判定缓存，样例邮件的结果不会留在缓存里"""
+    if snapshot.scorer is not None:
+        for text in texts:
+            snapshot.scorer.predict(text)
+    snapshot.model.predict(snapshot.vectorizer.transform(texts))
+
+
+def prepare(texts=None):
+    """加载模型和分词词典并预热，返回各阶段耗时（秒）"""
+    from predict import get_model
+
+    snapshot = _timed('model', get_model)
+    _timed('tokenizer', snapshot.vectorizer.prepare_tokenizer)
+    _timed('warmup', warm_up, snapshot, texts or STARTUP_CONFIG['warmup_texts'])
+    return dict(_phases)
+
+
+def record_first_request(seconds):
+    """记录启动后第一个请求的耗时，之后的调用直接返回"""
+    global _first_request_seconds
+    if _first_request_seconds is None:
+        _first_request_seconds = seconds
+
+
+def stats():
+    return {'phases': dict(_phases), 'first_request_seconds': _first_request_seconds}
+
+
+def _collect_metrics():
+    families = [('bayesmail_startup_seconds', 'gauge', '服务启动各阶段的耗时（import / model / tokenizer / warmup）',
+                 [({'phase': phase}, seconds) for phase, seconds in _phases.items()])]
+    if _first_request_seconds is not None:
+        families.append(('bayesmail_first_request_seconds', 'gauge', '启动后第一个请求的处理耗时',
+                         [({}, _first_request_seconds)]))
+    return families
+
+
+metrics.add_collector(_collect_metrics)
+
+
+def main():
+    phases = prepare()
+    for phase, seconds in phases.items():
+        print(f"{phase:<8} {seconds:.3f}s")
+    print(f"jieba 词典缓存目录: {STARTUP_CONFIG.get('jieba_cache_dir') or '系统临时目录'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+向量器使用的分词器
+
+jieba     结巴分词精确模式；指定 dictionary / userdict 时使用独立的 jieba.Tokenizer 实例加载自定义词典，
+          训练时记录词典文件的 SHA-1，服务端词典内容与训练时不一致时拒绝加载
+char      去掉空白后按字切分，取单字和相邻两字，不需要词典，速度是 jieba 的数倍
+
+分词器随向量器一起保存在模型文件中（spec() 返回可以写入 JSON 的参数，tokenizer_from_spec() 还原），
+服务端总是使用训练时的分词方式。prepare() 加载词典并返回分词函数，只在第一次调用时加载；
+check() 只检查词典文件，模型注册表加载模型时调用，词典不一致的模型不会替换正在服务的模型。
+"""
+import hashlib
+import marshal
+import os
+import threading
+
+from config import STARTUP_CONFIG
+
+# jieba 在第一次分词时才导入和初始化，只加载模型或数据库的脚本不需要付出这部分开销
+_jieba = None
+_custom_jieba = {}
+_jieba_lock = threading.Lock()
+
+
+def ensure_jieba():
+    """
+    导入并初始化 jieba（自带词典），返回 jieba 模块，只执行一次。
+    前缀词典缓存写在 STARTUP_CONFIG['jieba_cache_dir']（默认在系统临时目录，被清理后要重新构建数秒）
+    """
+    global _jieba
+    if _jieba is not None:
+        return _jieba
+    with _jieba_lock:
+        if _jieba is None:
+            import jieba
+            _initialize(jieba.dt)
+            _jieba = jieba
+    return _jieba
+
+
+def _initialize(tokenizer):
+    cache_dir = STARTUP_CONFIG.get('jieba_cache_dir')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        tokenizer.tmp_dir = cache_dir
+        _load_prefix_dict(tokenizer, cache_dir)
+    tokenizer.initialize()
+
+
+def _load_prefix_dict(tokenizer, cache_dir):
+    """
+    jieba 用 marshal.load 从文件中逐段读取缓存，比整个读入内存后 marshal.loads 慢几倍；
+    缓存文件有效（与 jieba 的判断相同）时在这里直接读入，否则由 jieba.initialize 构建并写入缓存
+    """
+    dictionary = tokenizer.dictionary
+    if dictionary is None:
+        path = os.path.join(cache_dir, 'jieba.cache')
+    else:
+        digest = hashlib.md5(dictionary.encode('utf-8', 'replace')).hexdigest()
+        path = os.path.join(cache_dir, 'jieba.u%s.cache' % digest)
+        if os.path.isfile(path) and os.path.getmtime(path) <= os.path.getmtime(dictionary):
+            return
+    try:
+        with open(path, 'rb') as f:
+            tokenizer.FREQ, tokenizer.total = marshal.loads(f.read())
+        tokenizer.initialized = True
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+
+
+def _file_sha1(path):
+    if path is None:
+        return None
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class JiebaTokenizer:
+    """结巴分词精确模式；dictionary 替换主词典，userdict 在主词典之上追加词语"""
+
+    name = 'jieba'
+
+    def __init__(self, dictionary=None, userdict=None):
+        self.dictionary = dictionary
+        self.userdict = userdict
+        self.checksums = [_file_sha1(dictionary), _file_sha1(userdict)]
+        self._cut = None
+
+    def spec(self):
+        return {'name': self.name, 'dictionary': self.dictionary, 'userdict': self.userdict,
+                'checksums': self.checksums}
+
+    def __getstate__(self):
+        state = self.spec()
+        del state['name']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cut = None
+
+    def check(self):
+        """词典文件与训练时的内容（SHA-1）不一致时抛出 ValueError，不加载词典"""
+        checksums = [_file_sha1(self.dictionary), _file_sha1(self.userdict)]
+        if checksums != self.checksums:
+            paths = ' '.join(path for path in (self.dictionary, self.userdict) if path)
+            raise ValueError(f"jieba 词典文件 {paths} 与训练时的内容不一致")
+
+    def prepare(self):
+        if self._cut is None:
+            if self.dictionary is None and self.userdict is None:
+                self._cut = ensure_jieba().lcut
+            else:
+                self._cut = self._load_custom().lcut
+        return self._cut
+
+    def _load_custom(self):
+        """同一组词典在进程内只加载一次，多个向量器副本（例如反馈学习的模型副本）共用"""
+        key = (self.dictionary, self.userdict)
+        with _jieba_lock:
+            tokenizer = _custom_jieba.get(key)
+            if tokenizer is not None:
+                return tokenizer
+            self.check()
+            import jieba
+            tokenizer = jieba.Tokenizer(dictionary=self.dictionary or jieba.DEFAULT_DICT)
+            _initialize(tokenizer)
+            if self.userdict:
+                tokenizer.load_userdict(self.userdict)
+            _custom_jieba[key] = tokenizer
+            return tokenizer
+
+    def tokenize(self, text):
+        return self.prepare()(text)
+
+
+class CharNgramTokenizer:
+    """去掉空白后取 ngram_range 范围内的字 n-gram（默认为单字和相邻两字），不需要词典"""
+
+    name = 'char'
+
+    def __init__(self, ngram_range=(1, 2)):
+        self.ngram_range = tuple(ngram_range)
+
+    def spec(self):
+        return {'name': self.name, 'ngram_range': list(self.ngram_range)}
+
+    def __getstate__(self):
+        return {'ngram_range': self.ngram_range}
+
+    def __setstate__(self, state):
+        self.ngram_range = tuple(state['ngram_range'])
+
+    def check(self):
+        pass
+
+    def prepare(self):
+        return self.tokenize
+
+    def tokenize(self, text):
+        chars = ''.join(text.split())
+        min_n, max_n = self.ngram_range
+        tokens = []
+        for n in range(min_n, max_n + 1):
+            if n == 1:
+                tokens.extend(chars)
+            else:
+                tokens.extend([chars[i:i + n] for i in range(len(chars) - n + 1)])
+        return tokens
+
+
+TOKENIZERS = {JiebaTokenizer.name: JiebaTokenizer, CharNgramTokenizer.name: CharNgramTokenizer}
+
+# 没有记录分词器的向量器（包括旧版本保存的模型）使用自带词典的 jieba
+DEFAULT_TOKENIZER = JiebaTokenizer()
+
+
+def make_tokenizer(name='jieba', **options):
+    """按名称创建分词器，options 为对应分词器的构造参数"""
+    if name not in TOKENIZERS:
+        raise ValueError(f"不支持的分词器: {name}")
+    return TOKENIZERS[name](**options)
+
+
+def tokenizer_from_spec(spec):
+    """由 spec() 的结果还原分词器（不重新计算词典的 SHA-1，加载时与训练时记录的值比较）"""
+    if spec is None:
+        return None
+    state = dict(spec)
+    cls = TOKENIZERS[state.pop('name')]
+    tokenizer = cls.__new__(cls)
+    tokenizer.__setstate__(state)
+    return tokenizer
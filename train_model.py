@@ -2,6 +2,7 @@ import numpy as np
 from sklearn.naive_bayes import MultinomialNB
 import joblib
 from predict import TfidfVectorizer
+from model_registry import save_model
 
 # 训练数据
 spam_texts = [
@@ -42,14 +43,8 @@ X_tfidf = vectorizer.fit_transform(X)
 model = MultinomialNB()
 model.fit(X_tfidf, y)
 
-# 创建model目录（如果不存在）
-import os
-if not os.path.exists('model'):
-    os.makedirs('model')
-
-# 保存模型和向量化器
-joblib.dump(model, 'model/naive_bayes_model.pkl')
-joblib.dump(vectorizer, 'model/tfidf_vectorizer.pkl')
+# 保存模型和向量化器（原子替换，运行中的服务会自动加载新模型）
+save_model(model, vectorizer)
 
 print("模型训练完成并保存！")
 
@@ -0,0 +1,335 @@
+# encoding=utf8
+"""
+全量语料的并行训练入口
+
+第一遍：分块流式读取 CSV，多进程并行分词，各进程统计本块的文档频率，
+主进程合并词表和文档频率，分词结果按块写入临时文件；
+第二遍：从临时文件逐块构造 TF-IDF 稀疏矩阵，用 MultinomialNB.partial_fit 增量训练。
+每个文档只分词一次，内存占用只与块大小和词表大小有关，与语料行数无关。
+指定 --hashing 时使用 HashingTfidfVectorizer，文档频率按哈希桶统计，不建立词表。
+--tokenizer char 改用按字切分的分词器，--dictionary / --userdict 让 jieba 使用自定义词典，分词器随模型保存。
+--min-df / --max-df / --max-features 按文档频率和总词频裁剪词表，--select chi2 --k N 再按 chi2
+（或互信息）得分保留 N 个特征；--compare 同时训练完整词表的模型，报告模型大小和准确率的变化。
+
+用法: python train_parallel.py --csv CNEC.csv --workers 8 [--hashing 262144]
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+from collections import Counter, deque
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.metrics import accuracy_score, log_loss
+
+from predict import CountVectorizer, TfidfVectorizer, HashingTfidfVectorizer, select_vocabulary, _tfidf_l2
+from model_registry import save_model
+from parallel import bounded_imap
+from tokenizer import TOKENIZERS, make_tokenizer
+
+CONTENT_INDEX = 'content'
+LABEL_INDEX = 'label'
+CLASSES = np.array([0, 1])  # 1表示垃圾邮件，0表示正常邮件，与 predict.py 保持一致
+
+_analyzer = None
+
+
+def _init_worker(ngram_range, n_features=None, tokenizer=None):
+    global _analyzer
+    if n_features:
+        _analyzer = HashingTfidfVectorizer(n_features=n_features, ngram_range=ngram_range, tokenizer=tokenizer)
+    else:
+        _analyzer = CountVectorizer(ngram_range=ngram_range, tokenizer=tokenizer)
+    _analyzer.prepare_tokenizer()
+
+
+def _segment_chunk(task):
+    """
+    子进程：对一块文档分词，并统计其中训练文档的文档频率和总词频；
+    哈希模式下文档频率按桶号统计，不需要总词频
+    """
+    texts, is_test = task
+    hashing = isinstance(_analyzer, HashingTfidfVectorizer)
+    ngram_lists = []
+    df = Counter()
+    tf = Counter()
+    for text, test in zip(texts, is_test):
+        ngrams = _analyzer._get_ngrams(text)
+        ngram_lists.append(ngrams)
+        if test:
+            continue
+        if hashing:
+            df.update(_analyzer._row_counts(ngrams).keys())
+        else:
+            counts = Counter(ngrams)
+            df.update(counts.keys())
+            tf.update(counts)
+    return ngram_lists, df, tf
+
+
+def _encode_labels(labels):
+    return np.array([1 if label in (1, '1', 'spam') else 0 for label in labels])
+
+
+def _read_chunks(csv_path, chunksize, test_frac, seed):
+    rng = np.random.RandomState(seed)
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        chunk = chunk.dropna(subset=[CONTENT_INDEX])
+        is_test = rng.random_sample(len(chunk)) < test_frac
+        yield chunk[CONTENT_INDEX].astype(str).tolist(), _encode_labels(chunk[LABEL_INDEX]), is_test
+
+
+def _iter_spill(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def feature_scores(method, clf, class_df):
+    """
+    特征选择的得分，越大越有用
+    chi2         与 sklearn.feature_selection.chi2 在训练矩阵上的结果相同，
+                 观测值就是 MultinomialNB 累计的各类特征值之和（feature_count_），不需要再读一遍语料
+    mutual_info  词是否出现与类别之间的互信息，由各类的文档频率 class_df 计算
+    """
+    class_count = clf.class_count_
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'chi2':
+            observed = clf.feature_count_
+            expected = np.outer(class_count / class_count.sum(), observed.sum(axis=0))
+            return np.nan_to_num((observed - expected) ** 2 / expected).sum(axis=0)
+        if method == 'mutual_info':
+            n_docs = class_count.sum()
+            p_class = (class_count / n_docs)[:, None]
+            scores = np.zeros(class_df.shape[1])
+            for counts in (class_df, class_count[:, None] - class_df):
+                p_joint = counts / n_docs
+                p_feature = p_joint.sum(axis=0)
+                scores += np.nan_to_num(p_joint * np.log(p_joint / (p_class * p_feature))).sum(axis=0)
+            return scores
+    raise ValueError(f"不支持的特征选择方法: {method}")
+
+
+def _fit(vectorizer, spill_path, with_class_df=False):
+    """逐块增量训练；with_class_df 为 True 时同时统计每个类别中各特征的文档频率"""
+    clf = MultinomialNB()
+    class_df = np.zeros((len(CLASSES), vectorizer._n_columns())) if with_class_df else None
+    for ngram_lists, labels, is_test in _iter_spill(spill_path):
+        train_mask = ~is_test
+        if not train_mask.any():
+            continue
+        X = _tfidf_l2(vectorizer._count_ngrams(ngram_lists), vectorizer.idf_)[train_mask]
+        y = labels[train_mask]
+        clf.partial_fit(X, y, classes=CLASSES)
+        if with_class_df:
+            for i, c in enumerate(CLASSES):
+                class_df[i] += X[y == c].getnnz(axis=0)
+    return clf, class_df
+
+
+def _evaluate(vectorizer, clf, spill_path):
+    """在留出集上评估，同时记录模型大小、反序列化和打分的耗时"""
+    y_true, y_prob = [], []
+    score_seconds = 0.0
+    for ngram_lists, labels, is_test in _iter_spill(spill_path):
+        if not is_test.any():
+            continue
+        start = time.perf_counter()
+        X = _tfidf_l2(vectorizer._count_ngrams(ngram_lists), vectorizer.idf_)
+        y_prob.append(clf.predict_proba(X[is_test])[:, 1])
+        score_seconds += time.perf_counter() - start
+        y_true.append(labels[is_test])
+
+    model_bytes = pickle.dumps(clf, protocol=pickle.HIGHEST_PROTOCOL)
+    vectorizer_bytes = pickle.dumps(vectorizer, protocol=pickle.HIGHEST_PROTOCOL)
+    start = time.perf_counter()
+    pickle.loads(model_bytes)
+    pickle.loads(vectorizer_bytes)
+    report = {
+        'features': vectorizer._n_columns(),
+        'model_bytes': len(model_bytes),
+        'vectorizer_bytes': len(vectorizer_bytes),
+        'load_seconds': time.perf_counter() - start,
+        'score_seconds': score_seconds
+    }
+    if y_true:
+        y_true = np.concatenate(y_true)
+        y_prob = np.concatenate(y_prob)
+        report['log_loss'] = log_loss(y_true, y_prob, labels=CLASSES)
+        report['accuracy'] = accuracy_score(y_true, (y_prob > 0.5).astype(int))
+    return report
+
+
+def _print_comparison(baseline, pruned):
+    """打印裁剪前后的对比，供选择模型大小和准确率的折中"""
+    rows = [
+        ('特征数', 'features', '{:.0f}'),
+        ('模型文件 (bytes)', 'model_bytes', '{:.0f}'),
+        ('向量器文件 (bytes)', 'vectorizer_bytes', '{:.0f}'),
+        ('反序列化耗时 (s)', 'load_seconds', '{:.4f}'),
+        ('测试集打分耗时 (s)', 'score_seconds', '{:.4f}'),
+        ('Log Loss', 'log_loss', '{:.4f}'),
+        ('Total Accuracy', 'accuracy', '{:.4f}')
+    ]
+    print(f"{'':<20}{'完整词表':>14}{'裁剪后':>14}{'变化':>14}")
+    for title, key, fmt in rows:
+        if key not in baseline:
+            continue
+        before, after = baseline[key], pruned[key]
+        if key in ('log_loss', 'accuracy'):
+            delta = f'{after - before:+.4f}'
+        else:
+            delta = f'{after / before:.2f}x' if before else '-'
+        print(f"{title:<20}{fmt.format(before):>14}{fmt.format(after):>14}{delta:>14}")
+
+
+def train(csv_path, workers=None, chunksize=2000, ngram_range=(1, 1), test_frac=0.2, seed=1, save=True,
+          n_features=None, min_df=1, max_df=1.0, max_features=None, select=None, k=None, compare=False,
+          tokenizer=None):
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    # 第一遍：并行分词，合并文档频率和总词频，分词结果写入临时文件
+    df = Counter()
+    tf = Counter()
+    n_train = n_test = n_tokens = 0
+    spill = tempfile.NamedTemporaryFile(prefix='bayesmail-tokens-', suffix='.pkl', delete=False)
+    try:
+        with spill, Pool(workers, initializer=_init_worker, initargs=(ngram_range, n_features, tokenizer)) as pool:
+            chunks = _read_chunks(csv_path, chunksize, test_frac, seed)
+            labels_and_masks = deque()
+
+            def tasks():
+                for texts, labels, is_test in chunks:
+                    labels_and_masks.append((labels, is_test))
+                    yield texts, is_test
+
+            for ngram_lists, chunk_df, chunk_tf in bounded_imap(pool, _segment_chunk, tasks(), workers * 2):
+                labels, is_test = labels_and_masks.popleft()
+                df.update(chunk_df)
+                tf.update(chunk_tf)
+                n_test += int(is_test.sum())
+                n_train += len(labels) - int(is_test.sum())
+                n_tokens += sum(len(ngrams) for ngrams in ngram_lists)
+                pickle.dump((ngram_lists, labels, is_test), spill, protocol=pickle.HIGHEST_PROTOCOL)
+                print(f"已分词 {n_train + n_test} 篇文档")
+        segment_seconds = time.perf_counter() - start
+
+        # 根据合并后的文档频率建立词表和 IDF
+        if n_features:
+            vectorizer = HashingTfidfVectorizer(n_features=n_features, ngram_range=ngram_range, tokenizer=tokenizer)
+            doc_freq = np.zeros(n_features)
+            doc_freq[np.fromiter(df.keys(), dtype=np.int64, count=len(df))] = list(df.values())
+        else:
+            vectorizer = TfidfVectorizer(ngram_range=ngram_range, min_df=min_df, max_df=max_df,
+                                         max_features=max_features, tokenizer=tokenizer)
+            vectorizer.vocabulary_ = {ngram: j for j, ngram in enumerate(df)}
+            vectorizer.index_ = {j: ngram for ngram, j in vectorizer.vocabulary_.items()}
+            doc_freq = np.fromiter(df.values(), dtype=np.float64, count=len(df))
+        vectorizer.idf_ = np.log((1 + n_train) / (1 + doc_freq)) + 1
+        vectorizer.fit_stats_ = {
+            'n_docs': n_train + n_test,
+            'n_tokens': n_tokens,
+            'seconds': segment_seconds,
+            'tokens_per_sec': n_tokens / segment_seconds if segment_seconds > 0 else 0.0
+        }
+
+        baseline = None
+        pruning = min_df != 1 or max_df != 1.0 or max_features is not None
+        if compare and (pruning or select):
+            full_clf, _ = _fit(vectorizer, spill.name)
+            baseline = _evaluate(vectorizer, full_clf, spill.name)
+            del full_clf
+
+        # 按文档频率和总词频裁剪词表（与 CountVectorizer 的 min_df / max_df / max_features 相同）
+        if pruning:
+            term_freq = np.fromiter((tf[ngram] for ngram in df), dtype=np.float64, count=len(df))
+            vectorizer.restrict(select_vocabulary(doc_freq, term_freq, n_train, min_df, max_df, max_features))
+            del term_freq
+        del df, tf
+
+        # 先在裁剪后的词表上训练一遍，按 chi2 / 互信息得分保留 k 个特征，再重新训练
+        if select:
+            clf, class_df = _fit(vectorizer, spill.name, with_class_df=select == 'mutual_info')
+            scores = feature_scores(select, clf, class_df)
+            vectorizer.restrict(np.sort(np.argsort(-scores, kind='stable')[:k]))
+
+        # 第二遍：逐块增量训练，在留出集上评估
+        clf, _ = _fit(vectorizer, spill.name)
+        report = _evaluate(vectorizer, clf, spill.name)
+    finally:
+        os.unlink(spill.name)
+
+    total_seconds = time.perf_counter() - start
+    stats = vectorizer.fit_stats_
+    size = f"哈希桶数 {n_features}" if n_features else f"词表大小 {len(vectorizer.vocabulary_)}"
+    print(f"训练集 {n_train} 篇, 测试集 {n_test} 篇, {size}")
+    print(f"分词耗时 {segment_seconds:.2f}s ({workers} 个进程, {stats['tokens_per_sec']:.0f} tokens/s), "
+          f"总耗时 {total_seconds:.2f}s")
+    if 'accuracy' in report:
+        print(f"Log Loss: {report['log_loss']:.4f}")
+        print(f"Total Accuracy: {report['accuracy']:.4f}")
+    if baseline is not None:
+        _print_comparison(baseline, report)
+
+    if save:
+        save_model(clf, vectorizer)
+        print("模型训练完成并保存！")
+    return clf, vectorizer
+
+
+def _df_value(text):
+    return float(text) if '.' in text else int(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分块并行训练朴素贝叶斯垃圾邮件分类模型')
+    parser.add_argument('--csv', default='./CNEC.csv', help='训练语料，label,content 格式')
+    parser.add_argument('--workers', type=int, default=None, help='分词进程数，默认为 CPU 核数')
+    parser.add_argument('--chunksize', type=int, default=2000, help='每块的文档数')
+    parser.add_argument('--ngram-max', type=int, default=1, help='n-gram 的最大长度')
+    parser.add_argument('--tokenizer', choices=sorted(TOKENIZERS), default='jieba',
+                        help='分词器：jieba 为结巴分词，char 为单字和相邻两字（不需要词典）')
+    parser.add_argument('--dictionary', default=None, help='jieba 使用的主词典文件，默认为自带词典')
+    parser.add_argument('--userdict', default=None, help='jieba 追加的自定义词典文件')
+    parser.add_argument('--test-frac', type=float, default=0.2, help='留出测试集的比例')
+    parser.add_argument('--hashing', type=int, default=None, metavar='N',
+                        help='使用 N 个哈希桶的特征哈希向量器，不建立词表')
+    parser.add_argument('--min-df', type=_df_value, default=1,
+                        help='文档频率低于该值的词不进入词表，整数为文档数，小数为比例')
+    parser.add_argument('--max-df', type=_df_value, default=1.0,
+                        help='文档频率高于该值的词不进入词表，整数为文档数，小数为比例')
+    parser.add_argument('--max-features', type=int, default=None, help='只保留总词频最高的 N 个词')
+    parser.add_argument('--select', choices=['chi2', 'mutual_info'], default=None,
+                        help='按 chi2 或互信息得分做特征选择，与 --k 一起使用')
+    parser.add_argument('--k', type=int, default=None, help='特征选择保留的特征数')
+    parser.add_argument('--compare', action='store_true',
+                        help='同时训练完整词表的模型，报告裁剪前后的大小、耗时和准确率变化')
+    parser.add_argument('--no-save', action='store_true', help='只评估，不保存模型')
+    args = parser.parse_args()
+    if args.hashing and (args.min_df != 1 or args.max_df != 1.0 or args.max_features or args.select):
+        parser.error('--hashing 没有词表，不能与词表裁剪和特征选择一起使用')
+    if bool(args.select) != bool(args.k):
+        parser.error('--select 和 --k 需要一起指定')
+    if args.tokenizer == 'char' and (args.dictionary or args.userdict):
+        parser.error('--dictionary / --userdict 只用于 jieba 分词器')
+    tokenizer = None
+    if args.tokenizer == 'char':
+        tokenizer = make_tokenizer('char')
+    elif args.dictionary or args.userdict:
+        tokenizer = make_tokenizer('jieba', dictionary=args.dictionary, userdict=args.userdict)
+    train(args.csv, workers=args.workers, chunksize=args.chunksize, ngram_range=(1, args.ngram_max),
+          test_frac=args.test_frac, save=not args.no_save, n_features=args.hashing, min_df=args.min_df,
+          max_df=args.max_df, max_features=args.max_features, select=args.select, k=args.k,
+          compare=args.compare, tokenizer=tokenizer)
+
+
+if __name__ == '__main__':
+    main()
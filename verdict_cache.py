@@ -0,0 +1,202 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from config import VERDICT_CACHE_CONFIG
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_content(content):
+    """归一化邮件内容：全角半角统一、空白折叠，同一批垃圾邮件的副本得到相同结果"""
+    content = unicodedata.normalize('NFKC', content or '')
+    return _WHITESPACE.sub(' ', content).strip()
+
+
+def make_key(content, model_version):
+    digest = hashlib.sha256(model_version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_content(content).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SharedVerdictStore:
+    """
+    基于本地 SQLite 文件的共享缓存，同一台机器上的多个 worker 进程共用，
+    每个线程使用自己的连接
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._puts = 0
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                is_spam INTEGER NOT NULL,
+                model_version TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT is_spam FROM verdicts WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return None if row is None else bool(row[0])
+
+    def put(self, key, is_spam, model_version):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO verdicts (key, is_spam, model_version, expires_at) VALUES (?, ?, ?, ?)",
+            (key, int(is_spam), model_version, time.time() + self.ttl)
+        )
+        # 每写入一定次数清理一次过期记录，控制文件大小
+        self._puts += 1
+        if self._puts % 1000 == 0:
+            conn.execute("DELETE FROM verdicts WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+
+    def delete(self, key):
+        conn = self._conn()
+        conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+        conn.commit()
+
+    def after_fork(self):
+        """SQLite 连接不能跨 fork 使用，子进程中重新连接"""
+        self._local = threading.local()
+
+    def purge_other_versions(self, model_version):
+        conn = self._conn()
+        conn.execute("DELETE FROM verdicts WHERE model_version != ?", (model_version,))
+        conn.commit()
+
+
+class VerdictCache:
+    """
+    垃圾邮件判定结果缓存，键为归一化内容和模型版本的哈希。
+    第一层是进程内的 LRU + TTL 缓存，第二层是可选的进程间共享 SQLite 缓存；
+    模型重新加载后自动清空。
+    """
+
+    def __init__(self, max_size=10000, ttl=3600, shared_path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = SharedVerdictStore(shared_path, ttl) if shared_path else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, content, model_version):
+        """返回缓存的判定结果（是否为垃圾邮件），没有命中返回 None"""
+        key = make_key(content, model_version)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                is_spam, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return is_spam
+                del self._entries[key]
+
+        if self._shared is not None:
+            try:
+                is_spam = self._shared.get(key)
+            except sqlite3.Error as e:
+                print(f"读取共享缓存失败: {e}")
+                is_spam = None
+            if is_spam is not None:
+                self._remember(key, is_spam, now)
+                with self._lock:
+                    self.shared_hits += 1
+                return is_spam
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, content, model_version, is_spam):
+        key = make_key(content, model_version)
+        self._remember(key, is_spam, time.time())
+        if self._shared is not None:
+            try:
+                self._shared.put(key, is_spam, model_version)
+            except sqlite3.Error as e:
+                print(f"写入共享缓存失败: {e}")
+
+    def _remember(self, key, is_spam, now):
+        with self._lock:
+            self._entries[key] = (is_spam, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, content, model_version):
+        """删除该内容的判定结果（例如用户把邮件标记为正常邮件后），进程内缓存和共享缓存都删除"""
+        key = make_key(content, model_version)
+        with self._lock:
+            self._entries.pop(key, None)
+        if self._shared is not None:
+            try:
+                self._shared.delete(key)
+            except sqlite3.Error as e:
+                print(f"删除共享缓存失败: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def after_fork(self):
+        """在 fork 出的子进程中调用，重新创建锁和共享缓存的连接"""
+        self._lock = threading.Lock()
+        if self._shared is not None:
+            self._shared.after_fork()
+
+    def on_model_reload(self, snapshot):
+        """模型替换后的回调：旧版本的判定结果全部作废"""
+        self.clear()
+        if self._shared is not None:
+            try:
+                self._shared.purge_other_versions(snapshot.version)
+            except sqlite3.Error as e:
+                print(f"清理共享缓存失败: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses
+            }
+
+
+verdict_cache = VerdictCache(
+    max_size=VERDICT_CACHE_CONFIG['max_size'],
+    ttl=VERDICT_CACHE_CONFIG['ttl'],
+    shared_path=VERDICT_CACHE_CONFIG.get('shared_path')
+)
@@ -28,8 +28,8 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    // 加载邮件列表
-    async function loadEmails(folder = 'inbox') {
+    // 加载邮件列表，cursor 不为空时在列表末尾追加下一页
+    async function loadEmails(folder = 'inbox', cursor = null) {
         try {
             // 根据文件夹类型选择不同的API端点
             let endpoint;
@@ -44,6 +44,13 @@ document.addEventListener('DOMContentLoaded', function() {
                     endpoint = '/api/inbox';
             }
 
+            // 列表只需要邮件头和摘要，正文在打开邮件时再获取
+            const params = new URLSearchParams({ view: 'summary' });
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            endpoint += `?${params}`;
+
             const response = await fetch(endpoint, {
                 credentials: 'include'
             });
@@ -58,9 +65,15 @@ document.addEventListener('DOMContentLoaded', function() {
 
             const data = await response.json();
             const emailList = document.getElementById('emailList');
-            emailList.innerHTML = '';
+            const loadMore = emailList.querySelector('.load-more');
+            if (loadMore) {
+                loadMore.remove();
+            }
+            if (!cursor) {
+                emailList.innerHTML = '';
+            }
 
-            if (data.emails.length === 0) {
+            if (data.emails.length === 0 && !cursor) {
                 emailList.innerHTML = `<div class="no-emails">暂无${folder === 'spam' ? '垃圾' : ''}邮件</div>`;
                 return;
             }
@@ -90,13 +103,22 @@ document.addEventListener('DOMContentLoaded', function() {
                         ${folder === 'spam' ? '<i class="ri-spam-2-line"></i>' : ''}
                         ${email.subject}
                     </div>
-                    <div class="preview">${email.content.substring(0, 100)}...</div>
+                    <div class="preview">${email.snippet}...</div>
                 `;
 
                 emailItem.addEventListener('click', () => loadEmailContent(email.id));
                 emailList.appendChild(emailItem);
             });
 
+            // 还有更多邮件时显示"加载更多"
+            if (data.has_more) {
+                const loadMoreButton = document.createElement('div');
+                loadMoreButton.className = 'load-more';
+                loadMoreButton.textContent = '加载更多';
+                loadMoreButton.addEventListener('click', () => loadEmails(folder, data.next_cursor));
+                emailList.appendChild(loadMoreButton);
+            }
+
             // 更新文件夹标题
             const folderTitle = document.querySelector('.email-list-header h2');
             switch (folder) {